@@ -1,6 +1,7 @@
 from .base_model import BaseModel
 from .base_serializer import BaseSerializer
 from .base_views import (
+    BaseBulkApiView,
     BaseCreateApiView,
     BaseListApiView,
     BaseRetrieveApiView,
@@ -12,6 +13,7 @@ __all__ = [
     "BaseModel",
     "BaseSerializer",
     "BaseView",
+    "BaseBulkApiView",
     "BaseCreateApiView",
     "BaseListApiView",
     "BaseRetrieveApiView",
@@ -3,49 +3,80 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
 
-import psycopg
 
-from python_api_backend.settings import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+def to_iso(value):
+    """datetime/date -> ISO 8601 string"""
+    return None if value is None else value.isoformat()
 
-# from python_api_backend.settings import DATABASE_CONFIG
 
+def to_float(value):
+    """Decimal (NUMERIC columns) -> float"""
+    return None if value is None else float(value)
 
-class DatabaseConnection:
-    """Singleton database connection manager"""
 
-    _connection = None
+def compile_plan(cls, fields):
+    """Generate a to_dict function for ``fields`` of ``cls``
 
-    @classmethod
-    # def get_connection(cls):
-    #     if cls._connection is None or cls._connection.closed:
-    #         cls._connection = psycopg.connect(
-    #             host=DATABASE_CONFIG.DB_HOST,
-    #             port=DATABASE_CONFIG.DB_PORT,
-    #             dbname=DATABASE_CONFIG.DB_NAME,
-    #             user=DATABASE_CONFIG.DB_USER,
-    #             password=DATABASE_CONFIG.DB_PASSWORD
-    #         )
-    #     return cls._connection
-    @classmethod
-    def get_connection(cls):
-        if cls._connection is None or cls._connection.closed:
-            cls._connection = psycopg.connect(
-                host=DB_HOST,
-                port=DB_PORT,
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-            )
-        return cls._connection
-
-    @classmethod
-    def close_connection(cls):
-        if cls._connection and not cls._connection.closed:
-            cls._connection.close()
-            cls._connection = None
+    The result is a single dict display with the converters bound as
+    globals, e.g. ``{'id': self.id, 'created_at': _c_created_at(...)}``, so
+    serializing a row does no reflection, hasattr or membership tests.
+    """
+    namespace = {}
+    items = []
+    for name in fields:
+        converter = cls.converters.get(name)
+        if converter is None:
+            items.append(f"{name!r}: self.{name}")
+        else:
+            namespace[f"_c_{name}"] = converter
+            items.append(f"{name!r}: _c_{name}(self.{name})")
+    exec(f"def to_dict(self):\n    return {{{', '.join(items)}}}\n", namespace)
+    to_dict = namespace["to_dict"]
+    to_dict.__qualname__ = f"{cls.__name__}.to_dict"
+    to_dict.__doc__ = "Convert model instance to dictionary"
+    return to_dict
 
 
 class BaseModel:
+    """Base class for models
+
+    Subclasses list their columns in ``__slots__`` and map fields needing
+    conversion to a converter in ``converters``. A specialised ``to_dict``
+    is compiled once, when the subclass is defined; models without
+    ``__slots__`` keep the reflective ``to_dict`` below.
+    """
+
+    __slots__ = ()
+    table_name = None
+    fields = ()
+    converters = {}  # field -> callable(value), e.g. to_iso
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = tuple(
+            name
+            for klass in reversed(cls.__mro__)
+            for name in klass.__dict__.get("__slots__", ())
+            if not name.startswith("_")
+        )
+        cls._plans = {}
+        if cls.fields and "to_dict" not in cls.__dict__:
+            cls.to_dict = cls.serializer_plan()
+
+    @classmethod
+    def serializer_plan(cls, include_fields=None, exclude_fields=()):
+        """Compiled to_dict for a field selection, built once and cached"""
+        key = (tuple(include_fields or ()), frozenset(exclude_fields or ()))
+        plan = cls._plans.get(key)
+        if plan is None:
+            fields = [
+                name
+                for name in cls.fields
+                if (not include_fields or name in include_fields) and name not in key[1]
+            ]
+            plan = cls._plans[key] = compile_plan(cls, fields)
+        return plan
+
     def to_dict(self):
         # a = self.__dict__.items()
         # for k, v in a:
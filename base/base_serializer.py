@@ -2,8 +2,14 @@ import json
 from datetime import datetime
 from typing import List
 
+from .base_model import BaseModel
+
 
 class BaseSerializer:
+    allowed_fields = ()  # Writable fields, override in subclass
+    required_fields = ()  # Must be present and non-null on create
+    field_types = {}  # field -> accepted Python type(s) of incoming JSON
+
     def __init__(
         self,
         instance,
@@ -20,6 +26,10 @@ class BaseSerializer:
         self.exclude_fields = exclude_fields or []
 
     def _serialize_instance(self, obj):
+        if isinstance(obj, BaseModel) and type(obj).fields:
+            plan = type(obj).serializer_plan(self.include_fields, self.exclude_fields)
+            return plan(obj)
+
         data = {}
         for key, value in obj.__dict__.items():
             if self.include_fields and key not in self.include_fields:
@@ -28,7 +38,7 @@ class BaseSerializer:
                 continue
 
             # Nested model
-            if hasattr(value, "__dict__"):
+            if isinstance(value, BaseModel) or hasattr(value, "__dict__"):
                 data[key] = self._serialize_instance(value)
             # datetime to ISO
             elif isinstance(value, datetime):
@@ -39,8 +49,47 @@ class BaseSerializer:
 
     def to_dict(self):
         if isinstance(self.instance, list):
-            return [self._serialize_instance(obj) for obj in self.instance]
+            items = self.instance
+            model_class = type(items[0]) if items else None
+            if (
+                model_class is not None
+                and issubclass(model_class, BaseModel)
+                and model_class.fields
+                and all(type(obj) is model_class for obj in items)
+            ):
+                # Resolve the plan once for a homogeneous list
+                plan = model_class.serializer_plan(
+                    self.include_fields, self.exclude_fields
+                )
+                return [plan(obj) for obj in items]
+            return [self._serialize_instance(obj) for obj in items]
         return self._serialize_instance(self.instance)
 
     def to_json(self, **kwargs):
         return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def deserialize(cls, json_data):
+        """Convert JSON to Python dict for database operations"""
+        return {k: v for k, v in json_data.items() if k in cls.allowed_fields}
+
+    @classmethod
+    def validate(cls, json_data, partial=False):
+        """Check one incoming object, returning (data, None) or (None, error)
+
+        With ``partial`` required fields may be omitted, as in an update.
+        """
+        if not isinstance(json_data, dict):
+            return None, "Expected a JSON object"
+        data = cls.deserialize(json_data)
+        if not partial:
+            missing = [f for f in cls.required_fields if data.get(f) is None]
+            if missing:
+                return None, f"Missing required fields: {', '.join(missing)}"
+        for key, value in data.items():
+            expected = cls.field_types.get(key)
+            if value is None or expected is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, expected):
+                return None, f"Invalid value for {key}"
+        return data, None
@@ -1,22 +1,340 @@
-from python_api_backend.db import get_db_connection
+import json
+from functools import partial
+
+from python_api_backend import coalescer, replicas
+from python_api_backend.cache import cache_key, get_cache
+from python_api_backend.db import (
+    INDEXES,
+    DataError,
+    IntegrityError,
+    get_record_cursor,
+    read_transaction,
+)
+from python_api_backend.pool import get_async_pool, get_pool
+from python_api_backend.settings import (
+    API_DEFAULT_PAGE_SIZE,
+    API_MAX_BULK_ITEMS,
+    API_MAX_PAGE_SIZE,
+    WRITE_COALESCE_ENABLED,
+)
+
+from .bulk import chunked, insert_many_sql, update_many_sql
+from .conditional import (
+    as_datetime,
+    is_conditional,
+    is_not_modified,
+    make_etag,
+    validator_headers,
+)
+from .expand import InvalidExpand, RelatedLoader, parse_expand
+from .fieldsets import InvalidFields, parse_fields, project, with_required
+from .filters import InvalidFilter, compile_filters, parse_sort
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_clause
+from .streaming import StreamingResponse, stream_json_list
 
 
 class BaseView:
-    """Base class for all views"""
+    """Base class for all views
+
+    Sync views use ``with self.connection() as conn``, or
+    ``self.read_connection()`` for queries a read replica may answer; views
+    that define ``async def`` handlers use
+    ``async with self.async_connection() as conn`` and are served by the
+    asyncio engine.
+    """
+
+    client = None  # address of the requesting client, set by the dispatcher
+    deadline = None  # deadlines.Deadline of the request, set by the dispatcher
+    request_timeout = None  # seconds; None means REQUEST_TIMEOUT
+
+    def __init__(self, pool=None, async_pool=None, cache=None):
+        """Initialize with optional connection pools and cache"""
+        self._pool = pool
+        self._async_pool = async_pool
+        self._cache = cache
+
+    @property
+    def pool(self):
+        # Resolved lazily so async views never create the threaded pool
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    @property
+    def async_pool(self):
+        if self._async_pool is None:
+            self._async_pool = get_async_pool()
+        return self._async_pool
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = get_cache()
+        return self._cache
+
+    def connection(self):
+        """Check out a pooled connection for the duration of a with block
+
+        Under a request deadline the connection's statement and lock
+        timeouts are the time left, and its query is cancelled when the
+        deadline passes (see python_api_backend.deadlines).
+        """
+        if self.deadline is None:
+            return self.pool.connection()
+        return self.deadline.bind(self.pool.connection)
+
+    def async_connection(self):
+        """Check out an async pooled connection for an async with block
+
+        Under a request deadline, as ``connection`` does.
+        """
+        if self.deadline is None:
+            return self.async_pool.connection()
+        return self.deadline.bind_async(self.async_pool.connection)
+
+    def read_connection(self):
+        """Check out a connection for read-only queries
+
+        A replica when DB_REPLICA_DSNS are set, unless this client wrote
+        recently and no replica has caught up with it yet. The read's
+        transaction is committed when the with block exits cleanly.
+        """
+        router = replicas.get_router()
+        if router is None or self._pool is not None:
+            return read_transaction(self.connection())
+        if self.deadline is None:
+            return read_transaction(router.connection(self.client))
+        return read_transaction(
+            self.deadline.bind(partial(router.connection, self.client))
+        )
+
+    def read_is_current(self):
+        """Whether a read now sees every write this process committed"""
+        router = replicas.get_router()
+        return router is None or self._pool is not None or router.is_current()
+
+    def record_write(self):
+        """Keep this client's reads off lagging replicas; call after a commit"""
+        router = replicas.get_router()
+        if router is not None:
+            router.record_write(self.client)
+
+    def run_write(self, write):
+        """Run ``write(cursor)`` in a transaction and return its result
+
+        With WRITE_COALESCE_ENABLED the transaction may be shared with
+        concurrent writes (see python_api_backend.coalescer), and the
+        deadline only sets the timeouts of the write's statements; either
+        way the write is committed, or its exception raised, when this
+        returns.
+        """
+        if WRITE_COALESCE_ENABLED:
+            writes = coalescer.get_coalescer()
+            if writes.pool is self.pool:
+                result = writes.submit(write, self.deadline)
+                self.record_write()
+                return result
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            result = write(cursor)
+            conn.commit()
+        self.record_write()
+        return result
+
+
+class ExpandableView(BaseView):
+    """Views whose records can embed related objects with ``?expand=``
+
+    ``relations`` maps an expand name to a Relation. The embedded objects
+    are batch-loaded per request and folded into the response validators.
+    """
+
+    relations = {}  # name -> Relation, override in subclass
+    expand = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaders = {}  # name -> RelatedLoader, per request
+
+    def parse_expand(self, request):
+        """Set ``self.expand`` from the query, returning an error or None"""
+        value = request.get("query", {}).get("expand")
+        self.expand = ()
+        if value:
+            try:
+                self.expand = parse_expand(value, self.relations)
+            except InvalidExpand as exc:
+                return str(exc)
+        return None
+
+    def expand_columns(self):
+        """Columns the requested expansions read their ids from"""
+        return tuple(self.relations[name].column for name in self.expand)
+
+    def load_related(self, records, cursor=None):
+        """Embed each requested relation into ``records`` in place
+
+        One query per relation for the whole batch, on ``cursor`` if given,
+        otherwise on a connection checked out only if the cache falls short.
+        """
+        cacheable = self.read_is_current()
+        for name in self.expand:
+            relation = self.relations[name]
+            loader = self._loaders.get(name)
+            if loader is None:
+                loader = self._loaders[name] = RelatedLoader(
+                    relation.model_class, self.cache
+                )
+            missing = loader.missing(record[relation.column] for record in records)
+            if missing and cursor is not None:
+                loader.fetch(cursor, missing, cacheable)
+            elif missing:
+                with self.read_connection() as conn:
+                    loader.fetch(get_record_cursor(conn), missing, cacheable)
+            for record in records:
+                record[name] = loader.get(record[relation.column])
 
-    def __init__(self, db_connection=None):
-        """Initialize with optional database connection function"""
-        self.get_connection = db_connection or get_db_connection
+    def forget_related(self):
+        """Release the related records loaded so far"""
+        for loader in self._loaders.values():
+            loader.forget()
 
+    def expand_validators(self, etag, last_modified, records):
+        """Fold the embedded objects' versions into a response's validators"""
+        versions = []
+        for record in records:
+            for name in self.expand:
+                related = record.get(name)
+                if related is None:
+                    continue
+                updated_at = related.get("updated_at")
+                versions.append((name, related["id"], updated_at))
+                if updated_at is not None and (
+                    last_modified is None
+                    or as_datetime(updated_at) > as_datetime(last_modified)
+                ):
+                    last_modified = updated_at
+        return make_etag(etag, versions), last_modified
+
+
+class BaseListApiView(ExpandableView):
+    """Cursor-paginated list of the rows in ``table_name``
+
+    Query params: ``limit`` (capped at ``max_page_size``), ``after`` (the
+    ``next`` token of the previous page) and ``count=true`` for an estimated
+    total. Pages are keyset-ordered on ``pagination_keys``, so the cost of a
+    page does not grow with how deep into the table it is.
+
+    ``stream=true`` skips the page limit and streams every row from a
+    server-side cursor instead, for exports.
+
+    ``fields=id,name`` selects only those columns (plus the pagination
+    keys, which are dropped again from the output). ``expand=name`` embeds
+    the objects of the view's ``relations``.
+
+    Columns in ``filter_fields`` can be filtered, e.g. ``model=Civic`` or
+    ``rent_rate__gte=10``, and ``sort=column`` / ``sort=-column`` orders by
+    one of ``ordering_fields`` (then id). Every ordering field must have a
+    ``(column, id)`` index in ``db.INDEXES``; this is checked when the view
+    class is defined, so a sort can never fall back to a full-table sort.
+    """
 
-class BaseListApiView(BaseView):
     table_name = None  # Override in subclass
     model_class = None  # Override in subclass
+    pagination_keys = ("id",)  # or ("created_at", "id")
+    filter_fields = {}  # column -> (parse, lookups), see filters.py
+    ordering_fields = ()  # columns clients may sort on
+    default_page_size = API_DEFAULT_PAGE_SIZE
+    max_page_size = API_MAX_PAGE_SIZE
+    stream_batch_size = 1000  # rows per server-side cursor fetch
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        indexed = {
+            columns[0]
+            for columns in INDEXES.get(cls.table_name, ())
+            if columns[1:] == ("id",)
+        }
+        unindexed = [f for f in cls.ordering_fields if f not in indexed]
+        if unindexed:
+            raise ValueError(
+                f"{cls.__name__} sorts on unindexed columns: {', '.join(unindexed)}"
+            )
 
     def validate_query_params(self, request):
-        # Override in subclass for custom validation
+        """Parse and validate pagination params
+
+        Subclasses adding their own checks should call super() first.
+        """
+        query = request.get("query", {})
+        limit = query.get("limit")
+        if limit is None:
+            self.limit = self.default_page_size
+        elif not limit.isdigit() or int(limit) < 1:
+            return False, "limit must be a positive integer"
+        else:
+            self.limit = min(int(limit), self.max_page_size)
+
+        self.descending = False
+        try:
+            self.conditions, self.condition_params = compile_filters(
+                query, self.filter_fields
+            )
+            if query.get("sort"):
+                column, self.descending = parse_sort(
+                    query["sort"], self.ordering_fields
+                )
+                self.pagination_keys = (column, "id") if column != "id" else ("id",)
+        except InvalidFilter as exc:
+            return False, str(exc)
+
+        self.after = None
+        if query.get("after"):
+            parsers = {
+                key: self.filter_fields[key][0]
+                for key in self.pagination_keys
+                if key in self.filter_fields
+            }
+            try:
+                self.after = decode_cursor(
+                    query["after"], self.pagination_keys, parsers
+                )
+            except InvalidCursor as exc:
+                return False, str(exc)
+
+        self.fields = None
+        if query.get("fields"):
+            try:
+                self.fields = parse_fields(query["fields"], self.model_class.fields)
+            except InvalidFields as exc:
+                return False, str(exc)
+
+        error = self.parse_expand(request)
+        if error:
+            return False, error
+
+        self.include_count = query.get("count", "").lower() in ("1", "true")
+        self.stream = query.get("stream", "").lower() in ("1", "true")
         return True, None
 
+    def selected_columns(self):
+        """Columns to SELECT: the requested fields and the pagination keys"""
+        if self.fields is None:
+            return self.model_class.fields
+        return with_required(
+            self.fields,
+            self.pagination_keys + self.expand_columns(),
+            self.model_class.fields,
+        )
+
+    def has_row_validators(self):
+        """Whether the page's id and updated_at are selected for validators"""
+        return {"id", "updated_at"}.issubset(self.selected_columns())
+
+    def can_probe(self):
+        """Whether a conditional GET can be answered by the validator probe"""
+        return self.has_row_validators() and not (self.expand or self.include_count)
+
     def get(self, request):
         if not self.table_name:
             return 400, {
@@ -31,28 +349,462 @@ class BaseListApiView(BaseView):
         is_valid, error = self.validate_query_params(request)
         if not is_valid:
             return 400, {"data": None, "message": error}
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM {self.table_name}")
-        rows = cursor.fetchall()
-        conn.close()
-
-        items = [self.model_class.from_db_row(row) for row in rows]
-        return 200, {
-            "data": [item.to_dict() for item in items],
-            "message": f"{self.table_name.capitalize()} fetched successfully",
-        }
 
-    pass
+        message = f"{self.table_name.capitalize()} fetched successfully"
+        if self.stream:
+            if self.deadline is not None:
+                # An export can take longer than the request timeout
+                self.deadline.stream()
+            return 200, StreamingResponse(
+                stream_json_list(self.stream_items(), self.to_dict, message)
+            )
+
+        if is_conditional(request) and self.can_probe():
+            etag, last_modified = self.probe_page_validators(request)
+            if is_not_modified(request, etag, last_modified):
+                return 304, None, validator_headers(etag, last_modified)
+
+        # One extra row tells us whether there is a next page
+        sql, params = self.build_query(limit=self.limit + 1)
+        with self.read_connection() as conn:
+            cursor = get_record_cursor(conn)
+            cursor.execute(sql, params)
+            fetched = cursor.fetchall()
+            if self.expand:
+                self.load_related(fetched, cursor)
+            count = self.estimate_count(conn.cursor()) if self.include_count else None
+
+        if self.has_row_validators():
+            etag, last_modified = self.page_validators(request, fetched)
+            if self.expand:
+                etag, last_modified = self.expand_validators(
+                    etag, last_modified, fetched
+                )
+        else:
+            # A narrow projection without updated_at is validated on its content
+            query = sorted(request.get("query", {}).items())
+            etag, last_modified = make_etag(self.table_name, query, fetched), None
+        if count is not None:
+            # The estimate is part of the body but has no modification time
+            etag, last_modified = make_etag(etag, count), None
+        if not self.can_probe() and is_not_modified(request, etag, last_modified):
+            return 304, None, validator_headers(etag, last_modified)
+        items = fetched[: self.limit]
+        next_cursor = None
+        if len(fetched) > self.limit:
+            last = items[-1]
+            next_cursor = encode_cursor([last[key] for key in self.pagination_keys])
+
+        pagination = {"limit": self.limit, "next": next_cursor}
+        if count is not None:
+            pagination["count"] = count
+        return (
+            200,
+            {
+                "data": [self.to_dict(item) for item in items],
+                "pagination": pagination,
+                "message": message,
+            },
+            validator_headers(etag, last_modified),
+        )
+
+    def page_validators(self, request, rows):
+        """ETag and Last-Modified of a page, from its (limit + 1) rows
+
+        The ETag covers every row's id and updated_at in page order, so a
+        row replaced by another, or updated, changes it.
+        """
+        query = sorted(request.get("query", {}).items())
+        versions = [(row["id"], row["updated_at"]) for row in rows]
+        last_modified = max(
+            (row["updated_at"] for row in rows if row["updated_at"]),
+            key=as_datetime,
+            default=None,
+        )
+        return make_etag(self.table_name, query, versions), last_modified
+
+    def probe_page_validators(self, request):
+        """Compute the page validators from its ids and versions alone"""
+        sql, params = self.build_query(limit=self.limit + 1, columns="id, updated_at")
+        with self.read_connection() as conn:
+            # A record cursor, so updated_at reads as on the full page
+            cursor = get_record_cursor(conn)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return self.page_validators(request, rows)
 
+    def build_query(self, limit=None, columns=None):
+        """SELECT for the current page, ordered on the pagination keys"""
+        if columns is None:
+            columns = ", ".join(self.selected_columns())
+        where, order_by = keyset_clause(self.pagination_keys, self.descending)
+        sql = f"SELECT {columns} FROM {self.table_name}"
+        conditions = list(self.conditions)
+        params = list(self.condition_params)
+        if self.after is not None:
+            conditions.append(where)
+            params.extend(self.after)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return sql, params
 
-class BaseRetrieveApiView(BaseView):
-    pass
+    def to_dict(self, item):
+        """Hook to reshape a record before it is sent; records are JSON-ready"""
+        if self.fields is None:
+            return item
+        return project(item, self.fields + self.expand)
+
+    def stream_items(self):
+        """Yield records from a server-side cursor, batch by batch
+
+        The pooled connection stays checked out until the generator is
+        exhausted or closed. Related objects are only held for the batch
+        that embeds them.
+        """
+        sql, params = self.build_query()
+        with self.read_connection() as conn:
+            cursor = get_record_cursor(conn, name=f"{self.table_name}_stream")
+            related_cursor = get_record_cursor(conn) if self.expand else None
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(self.stream_batch_size)
+                    if not rows:
+                        break
+                    if self.expand:
+                        self.load_related(rows, related_cursor)
+                    yield from rows
+                    if self.expand:
+                        # Keep memory flat: later batches go to the cache again
+                        self.forget_related()
+            finally:
+                cursor.close()
+
+    def estimate_count(self, cursor):
+        """Planner row estimate; avoids a full COUNT(*) scan
+
+        Unfiltered lists use the table's reltuples, filtered ones the row
+        estimate of the filtered query's plan.
+        """
+        if self.conditions:
+            where = " AND ".join(self.conditions)
+            cursor.execute(
+                f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {self.table_name} WHERE {where}",
+                self.condition_params,
+            )
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            (self.table_name,),
+        )
+        row = cursor.fetchone()
+        # reltuples is -1 for a table that has never been analyzed
+        return max(row[0], 0) if row else None
+
+
+class BaseRetrieveApiView(ExpandableView):
+    """Single-object reads through the in-process read-through cache
+
+    Query params: ``fields=id,name`` to return only some fields and
+    ``expand=name`` to embed the objects of the view's ``relations``.
+    """
+
+    table_name = None  # Override in subclass
+    model_class = None  # Override in subclass
+    fields = None
+
+    def validate_query_params(self, request):
+        """Parse ``fields`` and ``expand``, returning (is_valid, error)"""
+        value = request.get("query", {}).get("fields")
+        self.fields = None
+        if value:
+            try:
+                self.fields = parse_fields(value, self.model_class.fields)
+            except InvalidFields as exc:
+                return False, str(exc)
+        error = self.parse_expand(request)
+        if error:
+            return False, error
+        return True, None
+
+    def get_object(self, pk):
+        """Return the object with primary key ``pk`` as a dict, or None
+
+        With ``fields`` a cached full object is used if there is one;
+        otherwise only those columns (plus what the validators and
+        expansions need) are read, and the partial row is not cached. Pass
+        the result through ``project`` before sending it.
+        """
+        key = cache_key(self.model_class, pk)
+        data = self.cache.get(key)
+        if data is None:
+            data = self._read_object(key, pk)
+        if data is not None and self.expand:
+            # Never embed into the dict the cache holds
+            data = dict(data)
+            self.load_related([data])
+        return data
+
+    def _read_object(self, key, pk):
+        generation = self.cache.generation
+        cacheable = self.fields is None and self.read_is_current()
+        if self.fields is None:
+            columns = ", ".join(self.model_class.fields)
+        else:
+            columns = ", ".join(
+                with_required(
+                    self.fields,
+                    ("id", "updated_at") + self.expand_columns(),
+                    self.model_class.fields,
+                )
+            )
+        with self.read_connection() as conn:
+            cursor = get_record_cursor(conn)
+            cursor.execute(
+                f"SELECT {columns} FROM {self.table_name} WHERE id = %s", (pk,)
+            )
+            data = cursor.fetchone()
+        if data is not None and cacheable:
+            self.cache.set(key, data, generation)
+        return data
+
+    def project(self, obj):
+        """Trim a dict from get_object to the requested fields"""
+        return obj if self.fields is None else project(obj, self.fields + self.expand)
+
+    def get_validators(self, obj):
+        """ETag and Last-Modified headers for a dict from get_object"""
+        return validator_headers(*self._validators(obj))
+
+    def check_not_modified(self, request, pk):
+        """Answer a conditional GET from ``updated_at`` alone
+
+        Uses the cached object if there is one, otherwise a cheap
+        ``SELECT updated_at`` probe, so a 304 never loads or serializes the
+        row. Returns the 304 response, or None to serve the full object.
+        With ``expand`` the embedded objects are versioned too, so the
+        object is loaded (through the cache) and compared instead.
+        """
+        if not is_conditional(request):
+            return None
+
+        if self.expand:
+            obj = self.get_object(pk)
+            if obj is None:
+                return None
+            etag, updated_at = self._validators(obj)
+        else:
+            cached = self.cache.get(cache_key(self.model_class, pk))
+            if cached is not None:
+                updated_at = cached.get("updated_at")
+            else:
+                with self.read_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        f"SELECT updated_at FROM {self.table_name} WHERE id = %s",
+                        (pk,),
+                    )
+                    row = cursor.fetchone()
+                if row is None:
+                    return None
+                updated_at = row[0]
+            etag = self._etag(pk, updated_at)
+
+        if is_not_modified(request, etag, updated_at):
+            return 304, None, validator_headers(etag, updated_at)
+        return None
+
+    def _validators(self, obj):
+        updated_at = obj.get("updated_at")
+        etag = self._etag(obj["id"], updated_at)
+        if self.expand:
+            return self.expand_validators(etag, updated_at, [obj])
+        return etag, updated_at
+
+    def _etag(self, pk, updated_at):
+        updated_at = as_datetime(updated_at)
+        parts = [self.table_name, pk, updated_at.isoformat() if updated_at else None]
+        if self.fields is not None:
+            # Each projection is a different representation of the object
+            parts.append(",".join(self.fields))
+        return make_etag(*parts)
 
 
 class BaseUpdateApiView(BaseView):
-    pass
+    model_class = None  # Override in subclass
+
+    def invalidate(self, pk):
+        """Drop cached reads of the object; call after the write commits"""
+        self.cache.delete(cache_key(self.model_class, pk))
 
 
 class BaseCreateApiView(BaseView):
-    pass
+    model_class = None  # Override in subclass
+
+    def invalidate(self, pk):
+        """Drop cached reads of the object; call after the write commits"""
+        self.cache.delete(cache_key(self.model_class, pk))
+
+
+class BaseBulkApiView(BaseView):
+    """Create (POST) or partially update (PUT) many rows in one transaction
+
+    The body is a JSON array. Every item is validated on its own and gets its
+    own result, ``{"index", "id"}`` or ``{"index", "error"}``; the valid ones
+    are written ``batch_size`` rows per statement and committed together. A
+    database error aborts the whole request and nothing is written.
+    """
+
+    table_name = None  # Override in subclass
+    model_class = None  # Override in subclass
+    serializer_class = None  # Override in subclass
+    max_items = API_MAX_BULK_ITEMS
+    batch_size = 1000  # rows per INSERT / UPDATE statement
+
+    def post(self, request):
+        """Insert an array of new objects"""
+        items, error = self.get_items(request)
+        if error:
+            return 400, {"data": None, "message": error}
+
+        results = [None] * len(items)
+        valid = []  # (index, data)
+        for index, item in enumerate(items):
+            data, error = self.serializer_class.validate(item)
+            if error:
+                results[index] = {"index": index, "error": error}
+            else:
+                valid.append((index, data))
+
+        columns = list(self.serializer_class.allowed_fields)
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                valid = self._drop_bad_references(cursor, valid, results)
+                for batch in chunked(valid, self.batch_size):
+                    cursor.execute(
+                        insert_many_sql(self.table_name, columns, len(batch)),
+                        [data.get(column) for _, data in batch for column in columns],
+                    )
+                    for (index, _), row in zip(batch, cursor.fetchall()):
+                        results[index] = {"index": index, "id": row[0]}
+                conn.commit()
+                if valid:
+                    self.record_write()
+        except (IntegrityError, DataError) as exc:
+            return self.write_failed(exc)
+
+        return self.bulk_response(results, 201, "created")
+
+    def put(self, request):
+        """Apply partial updates to an array of objects identified by ``id``"""
+        items, error = self.get_items(request)
+        if error:
+            return 400, {"data": None, "message": error}
+
+        results = [None] * len(items)
+        valid, pks, seen = [], {}, set()  # (index, data); index -> pk; ids
+        for index, item in enumerate(items):
+            pk = item.get("id") if isinstance(item, dict) else None
+            data, error = self.serializer_class.validate(item, partial=True)
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                error = "id must be an integer"
+            elif pk in seen:
+                error = f"Duplicate id {pk}"
+            elif not error and not data:
+                error = "No fields to update"
+            if error:
+                results[index] = {"index": index, "error": error}
+            else:
+                valid.append((index, data))
+                pks[index] = pk
+                seen.add(pk)
+
+        updated = set()
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                valid = self._drop_bad_references(cursor, valid, results)
+                # Items setting the same fields share one statement per batch
+                groups = {}
+                for index, data in valid:
+                    columns = tuple(
+                        c for c in self.serializer_class.allowed_fields if c in data
+                    )
+                    groups.setdefault(columns, []).append((index, data))
+                for columns, group in groups.items():
+                    for batch in chunked(group, self.batch_size):
+                        cursor.execute(
+                            update_many_sql(self.table_name, columns, len(batch)),
+                            [
+                                value
+                                for index, data in batch
+                                for value in (pks[index], *(data[c] for c in columns))
+                            ],
+                        )
+                        updated.update(row[0] for row in cursor.fetchall())
+                conn.commit()
+                if valid:
+                    self.record_write()
+        except (IntegrityError, DataError) as exc:
+            return self.write_failed(exc)
+
+        for index, _ in valid:
+            pk = pks[index]
+            if pk in updated:
+                results[index] = {"index": index, "id": pk}
+            else:
+                results[index] = {"index": index, "error": f"{pk} not found"}
+        return self.bulk_response(results, 200, "updated")
+
+    def get_items(self, request):
+        """Return (items, None) for a usable body, or (None, error)"""
+        items = request.get("body")
+        if not isinstance(items, list) or not items:
+            return None, "Expected a non-empty JSON array"
+        if len(items) > self.max_items:
+            return None, f"At most {self.max_items} items per request"
+        return items, None
+
+    def check_references(self, cursor, valid):
+        """Return {index: error} for items pointing at missing related rows
+
+        Runs inside the write transaction, so a dangling foreign key is
+        reported against its own item instead of failing the whole batch.
+        """
+        return {}
+
+    def bulk_response(self, results, status, verb):
+        written = [r["id"] for r in results if "id" in r]
+        for pk in written:
+            self.invalidate(pk)
+        return (status if written else 400), {
+            "data": results,
+            "message": f"{len(written)} of {len(results)} {self.table_name} {verb}",
+        }
+
+    def write_failed(self, exc):
+        status = 409 if isinstance(exc, IntegrityError) else 400
+        lines = str(exc).strip().splitlines()
+        message = lines[0] if lines else type(exc).__name__
+        return status, {"data": None, "message": f"Nothing written: {message}"}
+
+    def invalidate(self, pk):
+        """Drop cached reads of the object; call after the write commits"""
+        self.cache.delete(cache_key(self.model_class, pk))
+
+    def _drop_bad_references(self, cursor, valid, results):
+        if not valid:
+            return valid
+        errors = self.check_references(cursor, valid)
+        for index, error in errors.items():
+            results[index] = {"index": index, "error": error}
+        return [(index, data) for index, data in valid if index not in errors]
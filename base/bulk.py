@@ -0,0 +1,39 @@
+"""Statement builders for bulk writes: one statement per batch of rows"""
+
+
+def chunked(items, size):
+    """Split a list into consecutive slices of at most ``size`` items"""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def insert_many_sql(table, columns, count):
+    """Multi-row INSERT of ``count`` rows returning their ids
+
+    Postgres returns the RETURNING rows of a VALUES insert in VALUES order,
+    which is what lets callers pair each id with the item it came from.
+    """
+    row = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        + ", ".join([row] * count)
+        + " RETURNING id"
+    )
+
+
+def update_many_sql(table, columns, count):
+    """UPDATE of ``count`` rows keyed on id, from one VALUES list
+
+    Parameters are laid out per row as ``id, *columns``. The VALUES list is
+    UNIONed under an empty SELECT of the table's own columns so each
+    parameter takes its column's type without spelling out casts.
+    """
+    keys = ("id", *columns)
+    row = "(" + ", ".join(["%s"] * len(keys)) + ")"
+    assignments = ", ".join(f"{column} = v.{column}" for column in columns)
+    return (
+        f"UPDATE {table} AS t SET {assignments}, updated_at = clock_timestamp() "
+        f"FROM (SELECT {', '.join(keys)} FROM {table} WHERE false "
+        f"UNION ALL VALUES {', '.join([row] * count)}) AS v "
+        "WHERE t.id = v.id RETURNING t.id"
+    )
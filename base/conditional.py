@@ -0,0 +1,77 @@
+"""ETag / Last-Modified validators and conditional GET evaluation"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from python_api_backend.protocol import get_header
+
+
+def make_etag(*parts):
+    """Weak ETag over the parts that determine a response's content"""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def as_datetime(value):
+    """Accept a datetime or the ISO string a model's to_dict produced"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def http_date(value):
+    """Format a timestamp (naive values are UTC) as an HTTP date"""
+    value = as_datetime(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validator_headers(etag, last_modified=None):
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_conditional(request):
+    headers = request.get("headers") or {}
+    return bool(
+        get_header(headers, "If-None-Match") or get_header(headers, "If-Modified-Since")
+    )
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """Evaluate If-None-Match, falling back to If-Modified-Since
+
+    If-Modified-Since is ignored when If-None-Match is present, and ETags
+    are compared weakly, as RFC 9110 prescribes for GET.
+    """
+    headers = request.get("headers") or {}
+    if_none_match = get_header(headers, "If-None-Match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        wanted = _opaque(etag)
+        return any(_opaque(tag) == wanted for tag in if_none_match.split(","))
+
+    if_modified_since = get_header(headers, "If-Modified-Since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    modified = as_datetime(last_modified)
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return modified.replace(microsecond=0) <= since
+
+
+def _opaque(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
@@ -0,0 +1,83 @@
+"""Embedding related objects (``?expand=``) without N+1 queries"""
+
+from python_api_backend.cache import cache_key
+
+
+class InvalidExpand(ValueError):
+    """Raised when ``expand`` names a relation the view does not have"""
+
+
+class Relation:
+    """A to-one relation: ``column`` holds the id of a ``model_class`` row"""
+
+    __slots__ = ("column", "model_class")
+
+    def __init__(self, column, model_class):
+        self.column = column
+        self.model_class = model_class
+
+
+def parse_expand(value, relations):
+    """Parse ``vehicle,...`` into a tuple of relation names"""
+    names = tuple(dict.fromkeys(n.strip() for n in value.split(",") if n.strip()))
+    unknown = [name for name in names if name not in relations]
+    if unknown:
+        raise InvalidExpand(f"Cannot expand: {', '.join(unknown)}")
+    return names
+
+
+class RelatedLoader:
+    """Per-request batch loader for one related model
+
+    Ids are deduplicated and remembered for the life of the loader, so an
+    object shared by many rows is read once. Reads go through the object
+    cache first, as retrieve does, and whatever is left is fetched with a
+    single ``id = ANY(%s)`` query. Fetched rows are only cached when the
+    read was current (see ``BaseView.read_is_current``).
+    """
+
+    def __init__(self, model_class, cache):
+        self.model_class = model_class
+        self.cache = cache
+        self._loaded = {}  # pk -> record, or None if it does not exist
+
+    def missing(self, ids):
+        """Ids not yet loaded, after consulting the cache"""
+        missing = []
+        for pk in set(ids):
+            if pk is None or pk in self._loaded:
+                continue
+            cached = self.cache.get(cache_key(self.model_class, pk))
+            if cached is not None:
+                self._loaded[pk] = cached
+            else:
+                missing.append(pk)
+        return sorted(missing)
+
+    def fetch(self, cursor, ids, cacheable=True):
+        """Load ``ids`` with one query on a record cursor
+
+        Pass ``cacheable=False`` when the cursor may read from a lagging
+        replica, so stale rows do not go into the cache.
+        """
+        generation = self.cache.generation
+        columns = ", ".join(self.model_class.fields)
+        cursor.execute(
+            f"SELECT {columns} FROM {self.model_class.table_name} WHERE id = ANY(%s)",
+            (ids,),
+        )
+        for pk in ids:
+            self._loaded[pk] = None
+        for record in cursor.fetchall():
+            self._loaded[record["id"]] = record
+            if cacheable:
+                self.cache.set(
+                    cache_key(self.model_class, record["id"]), record, generation
+                )
+
+    def get(self, pk):
+        return self._loaded.get(pk)
+
+    def forget(self):
+        """Drop the loaded records, e.g. between the batches of a stream"""
+        self._loaded.clear()
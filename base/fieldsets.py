@@ -0,0 +1,33 @@
+"""Sparse fieldsets: ``?fields=`` parsing and record projection"""
+
+
+class InvalidFields(ValueError):
+    """Raised when ``fields`` names a column outside the model's whitelist"""
+
+
+def parse_fields(value, allowed):
+    """Parse ``id,name,...`` into a tuple ordered like ``allowed``
+
+    Only names in ``allowed`` (the model's columns) are accepted, so the
+    result is safe to interpolate into a SELECT list.
+    """
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    if not requested:
+        raise InvalidFields("fields must name at least one field")
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in requested)
+
+
+def with_required(fields, required, allowed):
+    """``fields`` plus the columns a view needs internally, in model order"""
+    needed = set(fields).union(required)
+    return tuple(name for name in allowed if name in needed)
+
+
+def project(record, fields):
+    """Keep only ``fields`` of a record, dropping internally needed extras"""
+    if len(record) == len(fields):
+        return record
+    return {name: record[name] for name in fields}
@@ -0,0 +1,58 @@
+"""Declarative list filters and sorts compiled to parameterized SQL"""
+
+from datetime import datetime
+
+# ?field=value is "eq"; ?field__gte=value etc. pick another lookup
+LOOKUPS = {
+    "eq": "{} = %s",
+    "gt": "{} > %s",
+    "gte": "{} >= %s",
+    "lt": "{} < %s",
+    "lte": "{} <= %s",
+    "in": "{} = ANY(%s)",  # comma-separated values
+}
+
+
+class InvalidFilter(ValueError):
+    """Raised for a filter or sort the view does not allow"""
+
+
+def parse_datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def compile_filters(query, filter_fields):
+    """Turn query params into WHERE conditions and their parameters
+
+    ``filter_fields`` maps a column to ``(parse, lookups)``, e.g.
+    ``{"rent_rate": (float, ("gte", "lte"))}``. Params naming other columns
+    are left alone, so pagination and other params pass through.
+    """
+    conditions, params = [], []
+    for key in sorted(query):
+        column, _, lookup = key.partition("__")
+        if column not in filter_fields:
+            continue
+        parse, lookups = filter_fields[column]
+        lookup = lookup or "eq"
+        if lookup not in lookups:
+            raise InvalidFilter(f"Unsupported filter: {key}")
+        try:
+            if lookup == "in":
+                value = [parse(v) for v in query[key].split(",") if v]
+            else:
+                value = parse(query[key])
+        except (TypeError, ValueError):
+            raise InvalidFilter(f"Invalid value for {key}")
+        conditions.append(LOOKUPS[lookup].format(column))
+        params.append(value)
+    return conditions, params
+
+
+def parse_sort(value, ordering_fields):
+    """Parse ``sort=column`` or ``sort=-column`` into (column, descending)"""
+    descending = value.startswith("-")
+    column = value[1:] if descending else value
+    if column != "id" and column not in ordering_fields:
+        raise InvalidFilter(f"Sorting on {column} is not supported")
+    return column, descending
@@ -0,0 +1,64 @@
+"""Keyset (cursor) pagination helpers for list views"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a next-page token cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Encode the keyset values of the last row into an opaque token"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token, keys, parsers=None):
+    """Decode a token produced by encode_cursor for the given key columns
+
+    ``parsers`` maps a key to the callable that restores its type; keys
+    without one are read as datetimes, and ``id`` must be an integer.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, ValueError, UnicodeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor("Invalid cursor")
+
+    decoded = []
+    for key, value in zip(keys, values):
+        if key == "id":
+            if not isinstance(value, int):
+                raise InvalidCursor("Invalid cursor")
+        elif parsers and key in parsers:
+            try:
+                value = parsers[key](value)
+            except (TypeError, ValueError):
+                raise InvalidCursor("Invalid cursor")
+        else:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise InvalidCursor("Invalid cursor")
+        decoded.append(value)
+    return tuple(decoded)
+
+
+def keyset_clause(keys, descending=False):
+    """Build the row-comparison WHERE and ORDER BY fragments for ``keys``
+
+    All keys run in the same direction, which is what lets a single row
+    comparison (and a single B-tree index on the keys) serve every page.
+    """
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["%s"] * len(keys))
+    if descending:
+        order_by = ", ".join(f"{key} DESC" for key in keys)
+        return f"({columns}) < ({placeholders})", order_by
+    return f"({columns}) > ({placeholders})", columns
@@ -0,0 +1,46 @@
+"""Streaming JSON responses for export-sized reads"""
+
+import json
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StreamingResponse:
+    """Response body produced incrementally as an iterable of bytes
+
+    Returned by a view in place of the usual dict; the server sends it with
+    chunked transfer encoding as the chunks are produced.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self):
+        """Release whatever the producer holds (cursor, pooled connection)"""
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def stream_json_list(items, to_dict, message, chunk_size=STREAM_CHUNK_SIZE):
+    """Encode ``{"data": [...], "message": ...}`` one item at a time
+
+    Items are serialized as they arrive and flushed roughly every
+    ``chunk_size`` bytes, so memory stays bounded by the chunk size no
+    matter how many items there are.
+    """
+    yield b'{"data": ['
+    buffer, size, separator = [], 0, b""
+    for item in items:
+        encoded = separator + json.dumps(to_dict(item)).encode("utf-8")
+        separator = b", "
+        buffer.append(encoded)
+        size += len(encoded)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    buffer.append(b'], "message": ' + json.dumps(message).encode("utf-8") + b"}")
+    yield b"".join(buffer)
@@ -0,0 +1,92 @@
+"""Benchmark: rows/sec of the single-item and bulk write paths
+
+Runs the create and update views directly (no HTTP) against the database
+configured in settings/.env, so the numbers are the cost of the statements
+and round trips alone. Inserted rows are deleted again at the end.
+
+    python benchmarks/bench_bulk.py [rows ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.views import (  # noqa: E402
+    VehicleBulkApiView,
+    VehicleCreateApiView,
+    VehicleUpdateApiView,
+)
+from python_api_backend.pool import close_pool  # noqa: E402
+
+SIZES = (100, 1000, 5000)
+
+
+def make_items(count):
+    return [
+        {"name": f"bench-{i}", "model": "bench", "rent_rate": 10 + i % 50}
+        for i in range(count)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def single_create(items):
+    view = VehicleCreateApiView()
+    return [view.post({"body": item})[1]["data"][0]["id"] for item in items]
+
+
+def bulk_create(items):
+    status, data = VehicleBulkApiView().post({"body": items})
+    assert status == 201, data
+    return [result["id"] for result in data["data"]]
+
+
+def single_update(ids):
+    view = VehicleUpdateApiView()
+    for pk in ids:
+        view.put({"body": {"name": f"s-{pk}", "model": "bench", "rent_rate": 1}}, pk)
+
+
+def bulk_update(ids):
+    items = [{"id": pk, "name": f"b-{pk}", "rent_rate": 2} for pk in ids]
+    status, data = VehicleBulkApiView().put({"body": items})
+    assert status == 200, data
+
+
+def cleanup(view, ids):
+    with view.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM vehicles WHERE id = ANY(%s)", (ids,))
+        conn.commit()
+
+
+def run(sizes):
+    print(f"{'rows':>6} {'operation':<8} {'single rows/s':>14} {'bulk rows/s':>12}")
+    for size in sizes:
+        items = make_items(size)
+        single_secs, single_ids = timed(lambda: single_create(items))
+        bulk_secs, bulk_ids = timed(lambda: bulk_create(items))
+        print(
+            f"{size:>6} {'create':<8} {size / single_secs:>14.0f} {size / bulk_secs:>12.0f}"
+        )
+
+        single_secs, _ = timed(lambda: single_update(single_ids))
+        bulk_secs, _ = timed(lambda: bulk_update(bulk_ids))
+        print(
+            f"{size:>6} {'update':<8} {size / single_secs:>14.0f} {size / bulk_secs:>12.0f}"
+        )
+
+        cleanup(VehicleBulkApiView(), single_ids + bulk_ids)
+
+
+if __name__ == "__main__":
+    try:
+        run([int(arg) for arg in sys.argv[1:]] or SIZES)
+    finally:
+        close_pool()
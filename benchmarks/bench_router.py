@@ -0,0 +1,71 @@
+"""Micro-benchmark: URL resolve cost as the route table grows
+
+Compares the compiled Router against the previous approach of calling
+re.match on every pattern in turn. The looked-up paths are the last
+registered static and dynamic routes, which is the worst case for the
+linear scan.
+
+    python benchmarks/bench_router.py
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python_api_backend.routing import Router  # noqa: E402
+
+SIZES = (8, 64, 256, 512)
+NUMBER = 20000
+
+
+class View:
+    def get(self, request):
+        pass
+
+
+def build_patterns(size):
+    """Return ``size`` compiled-router patterns and their legacy regexes"""
+    patterns, legacy = [], []
+    for i in range(size // 2):
+        patterns.append((f"/api/resource{i}", View))
+        legacy.append((rf"^/api/resource{i}/?$", View))
+        patterns.append((f"/api/resource{i}/<int:pk>", View))
+        legacy.append((rf"^/api/resource{i}/(\d+)/?$", View))
+    return patterns, legacy
+
+
+def legacy_resolve(urlpatterns, path):
+    for pattern, view_class in urlpatterns:
+        match = re.match(pattern, path)
+        if match:
+            return view_class, match.groups()
+    return None, None
+
+
+def run():
+    print(f"{'routes':>7} {'path':<10} {'linear re (us)':>15} {'compiled (us)':>14}")
+    for size in SIZES:
+        patterns, legacy = build_patterns(size)
+        router = Router(patterns)
+        last = size // 2 - 1
+        for label, path in (
+            ("static", f"/api/resource{last}"),
+            ("dynamic", f"/api/resource{last}/42"),
+        ):
+            assert router.resolve(path)[0] is View
+            linear = timeit.timeit(
+                lambda: legacy_resolve(legacy, path), number=NUMBER // 10
+            )
+            compiled = timeit.timeit(lambda: router.resolve(path), number=NUMBER)
+            print(
+                f"{size:>7} {label:<10} "
+                f"{linear / (NUMBER // 10) * 1e6:>15.2f} "
+                f"{compiled / NUMBER * 1e6:>14.2f}"
+            )
+
+
+if __name__ == "__main__":
+    run()
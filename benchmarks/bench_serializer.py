@@ -0,0 +1,118 @@
+"""Micro-benchmark: per-row serialization cost and instance size
+
+Compares the compiled per-model to_dict and BaseSerializer plans with the
+previous reflective loops over ``__dict__``, on the same vehicle rows.
+
+    python benchmarks/bench_serializer.py
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base import BaseSerializer  # noqa: E402
+from core.models import Vehicle  # noqa: E402
+
+ROWS = 10000
+REPEAT = 5
+
+
+class LegacyVehicle:
+    """Vehicle as it was before: a plain __dict__ instance"""
+
+    def __init__(self, id, name, model, rent_rate, created_at, updated_at):
+        self.id = id
+        self.name = name
+        self.model = model
+        self.rent_rate = rent_rate
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def to_dict(self):
+        result = {}
+        for key, value in self.__dict__.items():
+            if not key.startswith("_"):
+                if hasattr(value, "isoformat"):
+                    result[key] = value.isoformat()
+                elif isinstance(value, Decimal):
+                    result[key] = float(value)
+                else:
+                    result[key] = value
+        return result
+
+
+def legacy_serialize(obj, include_fields=None, exclude_fields=()):
+    data = {}
+    for key, value in obj.__dict__.items():
+        if include_fields and key not in include_fields:
+            continue
+        if key in exclude_fields:
+            continue
+        if hasattr(value, "__dict__"):
+            data[key] = legacy_serialize(value, include_fields, exclude_fields)
+        elif isinstance(value, datetime):
+            data[key] = value.isoformat()
+        else:
+            data[key] = value
+    return data
+
+
+def make_rows(count):
+    now = datetime(2025, 1, 1, 12, 30)
+    return [(i, f"car{i}", "sedan", Decimal("49.90"), now, now) for i in range(count)]
+
+
+def per_row_us(fn):
+    return min(timeit.repeat(fn, number=1, repeat=REPEAT)) / ROWS * 1e6
+
+
+def instance_bytes(cls, rows):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [cls(*row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The row values are shared, so this is the instances themselves
+    return (after - before) / len(instances)
+
+
+def run():
+    rows = make_rows(ROWS)
+    legacy = [LegacyVehicle(*row) for row in rows]
+    compiled = [Vehicle(*row) for row in rows]
+    assert legacy[0].to_dict() == compiled[0].to_dict()
+
+    fields = ["id", "name", "rent_rate"]
+    cases = [
+        (
+            "model.to_dict",
+            lambda: [v.to_dict() for v in legacy],
+            lambda: [v.to_dict() for v in compiled],
+        ),
+        (
+            "serializer",
+            lambda: [legacy_serialize(v) for v in legacy],
+            lambda: BaseSerializer(compiled).to_dict(),
+        ),
+        (
+            "serializer include",
+            lambda: [legacy_serialize(v, fields) for v in legacy],
+            lambda: BaseSerializer(compiled, include_fields=fields).to_dict(),
+        ),
+    ]
+    print(f"{'case':<20} {'before (us/row)':>16} {'after (us/row)':>15}")
+    for label, before, after in cases:
+        print(f"{label:<20} {per_row_us(before):>16.3f} {per_row_us(after):>15.3f}")
+    print(
+        f"{'instance bytes':<20} {instance_bytes(LegacyVehicle, rows):>16.0f} "
+        f"{instance_bytes(Vehicle, rows):>15.0f}"
+    )
+
+
+if __name__ == "__main__":
+    run()
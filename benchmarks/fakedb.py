@@ -0,0 +1,175 @@
+"""In-memory stand-in for a psycopg connection, for benchmarks only
+
+Answers the statements the views issue from Python lists, so a benchmark
+run with it measures routing, views, serialization and HTTP without a
+database. It recognises statement shapes, not SQL: WHERE clauses other than
+``id = %s`` / ``id = ANY(%s)`` are ignored and every page starts at the
+first row, which is fine for timing and useless for anything else.
+
+    from python_api_backend.pool import configure_pool
+    configure_pool(connect=FakeDatabase.seeded(1000).connect)
+"""
+
+import re
+import threading
+from datetime import datetime
+
+_SELECT = re.compile(r"SELECT (?P<columns>.+?) FROM (?P<table>\w+)(?P<rest>.*)", re.S)
+_INSERT = re.compile(r"INSERT INTO (?P<table>\w+) \((?P<columns>[^)]*)\) VALUES")
+_UPDATE = re.compile(r"UPDATE (?P<table>\w+)")
+_UPDATE_ROWS = re.compile(r"\(SELECT (?P<columns>[^)]*?) FROM \w+ WHERE false")
+
+NOW = datetime(2025, 1, 1, 12, 0).isoformat()
+
+
+class FakeDatabase:
+    """Tables of dict rows shared by every connection made from it"""
+
+    def __init__(self):
+        self.tables = {"vehicles": {}, "users": {}}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def seeded(cls, rows):
+        """``rows`` vehicles and as many users, with ids 1..rows"""
+        db = cls()
+        for i in range(1, rows + 1):
+            db.insert(
+                "vehicles",
+                {"name": f"car-{i}", "model": "bench", "rent_rate": 10.0 + i % 50},
+            )
+            db.insert("users", {"username": f"user-{i}", "vehicle_id": i})
+        return db
+
+    def connect(self):
+        return FakeConnection(self)
+
+    def insert(self, table, values):
+        with self.lock:
+            rows = self.tables[table]
+            pk = len(rows) + 1
+            rows[pk] = dict(values, id=pk, created_at=NOW, updated_at=NOW)
+        return pk
+
+
+class FakeConnection:
+    """The parts of a psycopg connection the pool and views use"""
+
+    autocommit = False
+
+    def __init__(self, db):
+        self.db = db
+        self.closed = False
+
+    def cursor(self, name="", row_factory=None):
+        return FakeCursor(self.db, as_dicts=row_factory is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAdapters:
+    """Accepts the loaders a record cursor registers; rows are built as is"""
+
+    def register_loader(self, cls, loader):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db, as_dicts):
+        self.db = db
+        self.as_dicts = as_dicts
+        self.adapters = FakeAdapters()
+        self.rows = []
+        self.rowcount = -1
+
+    def execute(self, query, params=None):
+        params = list(params or ())
+        query = " ".join(query.split())
+        if query.startswith("INSERT"):
+            self.rows = self._insert(query, params)
+        elif query.startswith("UPDATE"):
+            self.rows = self._update(query, params)
+        elif query.startswith("EXPLAIN"):
+            self.rows = [
+                ([{"Plan": {"Plan Rows": len(self.db.tables[self._table(query)])}}],)
+            ]
+        elif "pg_class" in query:
+            self.rows = [(len(self.db.tables[params[0]]),)]
+        elif query.startswith("SELECT 1"):
+            self.rows = [(1,)]
+        elif query.startswith("SELECT set_config"):
+            self.rows = [tuple(params)]
+        elif query.startswith(("SAVEPOINT", "RELEASE", "ROLLBACK", "SET ")):
+            self.rows = []
+        else:
+            match = _SELECT.match(query)
+            columns = [c.strip() for c in match.group("columns").split(",")]
+            records = self._select(query, params)
+            if self.as_dicts:
+                self.rows = [{c: r[c] for c in columns} for r in records]
+            else:
+                self.rows = [tuple(r[c] for c in columns) for r in records]
+        self.rowcount = len(self.rows)
+
+    def _table(self, query):
+        return re.search(r"FROM (\w+)", query).group(1)
+
+    def _select(self, query, params):
+        match = _SELECT.match(query)
+        table = self.db.tables[match.group("table")]
+        rest = match.group("rest")
+        if "id = ANY(%s)" in rest:
+            return [table[pk] for pk in params[0] if pk in table]
+        if "id = %s" in rest:
+            record = table.get(params[0])
+            return [record] if record else []
+        records = list(table.values())
+        if "LIMIT" in rest:
+            return records[: params[-1]]
+        return records
+
+    def _insert(self, query, params):
+        match = _INSERT.match(query)
+        columns = [c.strip() for c in match.group("columns").split(",")]
+        ids = []
+        for start in range(0, len(params), len(columns)):
+            values = dict(zip(columns, params[start : start + len(columns)]))
+            ids.append((self.db.insert(match.group("table"), values),))
+        return ids
+
+    def _update(self, query, params):
+        table = self.db.tables[_UPDATE.match(query).group(1)]
+        rows = _UPDATE_ROWS.search(query)
+        if rows is None:
+            # single-row UPDATE ... WHERE id = %s; only rowcount is read
+            return [()] if params[-1] in table else []
+        # update_many_sql: VALUES rows laid out as id, *columns
+        width = rows.group("columns").count(",") + 1
+        return [(pk,) for pk in params[::width] if pk in table]
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
@@ -0,0 +1,594 @@
+"""Benchmark and load-test suite with JSON results
+
+``run`` measures four groups and writes one JSON document:
+
+- ``startup``: time and resident memory of a fresh interpreter importing
+  the server (what a restart pays; prefork workers inherit it from the
+  master), the share of it that is the database driver's own import, and
+  the slowest imports from ``python -X importtime``
+- ``router``: URLRouter.match for every route in urlpatterns
+- ``serializer``: model construction, to_dict, BaseSerializer, record
+  projection and json.dumps, in rows/s, at each table size
+- ``http``: for each table size a server process is started and every
+  endpoint in urlpatterns is loaded at each concurrency level for a fixed
+  time, reporting req/s and p50/p99 latency
+
+By default the server talks to the database configured in settings/.env:
+tables are topped up with ``bench`` rows to each size and those rows are
+deleted at the end. With ``--fake`` the server uses the in-memory
+connection in benchmarks/fakedb.py instead, so only the Python layers
+(HTTP, routing, views, serialization) are measured.
+
+``compare`` reports every metric that moved by more than a threshold
+between two result files and exits non-zero on a regression.
+
+    python benchmarks/suite.py run --fake --output results.json
+    python benchmarks/suite.py run --sizes 1000,100000 --concurrency 1,16,64
+    python benchmarks/suite.py compare baseline.json results.json
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from base import BaseSerializer  # noqa: E402
+from base.fieldsets import project  # noqa: E402
+from core.models import Vehicle  # noqa: E402
+from python_api_backend.urls import URLRouter, urlpatterns  # noqa: E402
+
+SIZES = (1000, 10000)
+CONCURRENCY = (1, 8, 32)
+DURATION = 3.0  # seconds per endpoint and concurrency level
+WARMUP = 50  # requests per endpoint before measuring
+BULK_ITEMS = 10  # items per bulk request
+STARTUP_MODULE = "python_api_backend.server"  # imports every route's views
+STARTUP_DRIVER = "psycopg"  # imported by the server, timed on its own too
+STARTUP_RUNS = 5  # fresh interpreters; the fastest is reported
+STARTUP_SLOWEST = 15  # imports listed by cumulative time
+METHODS = ("GET", "POST", "PUT")
+
+# Unique per run, so created usernames never collide with earlier runs
+RUN = uuid.uuid4().hex[:8]
+
+
+# -- endpoints --------------------------------------------------------------
+
+
+def endpoints():
+    """``(method, pattern, table)`` for every handler in urlpatterns"""
+    result = []
+    for pattern, view_class in urlpatterns:
+        table = next(
+            (
+                name
+                for name in ("vehicles", "users")
+                if pattern.startswith(f"/api/{name}")
+            ),
+            None,
+        )
+        for method in METHODS:
+            if callable(getattr(view_class, method.lower(), None)):
+                result.append((method, pattern, table))
+    return result
+
+
+def make_item(table, n, ids):
+    if table == "vehicles":
+        return {"name": f"bench-{n}", "model": "bench", "rent_rate": 10 + n % 50}
+    vehicle_ids = ids["vehicles"]
+    return {
+        "username": f"bench-{RUN}-{n}",
+        "vehicle_id": vehicle_ids[n % len(vehicle_ids)],
+    }
+
+
+def make_request(method, pattern, table, n, ids):
+    """Path and JSON body of the ``n``-th request to an endpoint"""
+    table_ids = ids.get(table) or [1]
+    path = re.sub(r"<[^>]+>", str(table_ids[n % len(table_ids)]), pattern)
+    if method == "GET":
+        return path, None
+    if not pattern.endswith("/bulk"):
+        return path, make_item(table, n, ids)
+    numbers = range(n * BULK_ITEMS, (n + 1) * BULK_ITEMS)
+    if method == "POST":
+        return path, [make_item(table, i, ids) for i in numbers]
+    return path, [
+        dict(make_item(table, i, ids), id=table_ids[i % len(table_ids)])
+        for i in numbers
+    ]
+
+
+# -- pure-Python layers -----------------------------------------------------
+
+
+def best_of(fn, number, repeat=3):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def bench_router():
+    router = URLRouter()
+    ids = {"vehicles": [42], "users": [42]}
+    results = []
+    for method, pattern, table in endpoints():
+        path = make_request("GET", pattern, table, 0, ids)[0]
+        seconds = best_of(lambda: router.match(method, path), 100000)
+        results.append({"method": method, "route": pattern, "ns_per_op": seconds * 1e9})
+    return results
+
+
+_STARTUP_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+rss_kb = None
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": seconds, "rss_kb": rss_kb, "modules": len(sys.modules)}}))
+"""
+
+
+def _probe_startup(*options, module=STARTUP_MODULE):
+    result = subprocess.run(
+        [sys.executable, *options, "-c", _STARTUP_PROBE.format(module=module)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout), result.stderr
+
+
+def _slowest_imports(importtime):
+    """Parse ``-X importtime`` output into the slowest imports"""
+    imports = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the column header
+        imports.append(
+            {
+                "module": fields[2].strip(),
+                "self_ms": int(fields[0]) / 1000,
+                "cumulative_ms": int(fields[1]) / 1000,
+            }
+        )
+    imports.sort(key=lambda item: item["cumulative_ms"], reverse=True)
+    return imports[:STARTUP_SLOWEST]
+
+
+def bench_startup():
+    runs = [_probe_startup()[0] for _ in range(STARTUP_RUNS)]
+    driver_runs = [
+        _probe_startup(module=STARTUP_DRIVER)[0] for _ in range(STARTUP_RUNS)
+    ]
+    _, importtime = _probe_startup("-X", "importtime")
+    import_ms = min(run["seconds"] for run in runs) * 1000
+    driver_ms = min(run["seconds"] for run in driver_runs) * 1000
+    return {
+        "module": STARTUP_MODULE,
+        "import_ms": import_ms,
+        "driver": STARTUP_DRIVER,
+        "driver_import_ms": driver_ms,
+        "app_import_ms": import_ms - driver_ms,
+        "rss_mb": min(run["rss_kb"] for run in runs) / 1024,
+        "modules": runs[0]["modules"],
+        "slowest": _slowest_imports(importtime),
+    }
+
+
+def bench_serializer(sizes):
+    now = datetime(2025, 1, 1, 12, 30)
+    results = []
+    for size in sizes:
+        rows = [(i, f"car{i}", "sedan", 49.9, now, now) for i in range(size)]
+        vehicles = [Vehicle(*row) for row in rows]
+        records = [vehicle.to_dict() for vehicle in vehicles]
+        fields = ("id", "name", "rent_rate")
+        cases = {
+            "model init": lambda: [Vehicle(*row) for row in rows],
+            "model.to_dict": lambda: [vehicle.to_dict() for vehicle in vehicles],
+            "serializer": lambda: BaseSerializer(vehicles).to_dict(),
+            "serializer fields": lambda: BaseSerializer(
+                vehicles, include_fields=fields
+            ).to_dict(),
+            "record project": lambda: [project(record, fields) for record in records],
+            "json.dumps": lambda: json.dumps(records),
+        }
+        for case, fn in cases.items():
+            seconds = best_of(fn, 1, repeat=5)
+            results.append({"case": case, "rows": size, "rows_per_sec": size / seconds})
+    return results
+
+
+# -- database seeding (live mode) -------------------------------------------
+
+
+def seed(size):
+    """Top both tables up to ``size`` bench rows; return their ids"""
+    from base.bulk import chunked, insert_many_sql
+    from python_api_backend.db import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM vehicles WHERE model = 'bench' ORDER BY id")
+        vehicle_ids = [row[0] for row in cursor.fetchall()]
+        for batch in chunked(list(range(len(vehicle_ids), size)), 1000):
+            cursor.execute(
+                insert_many_sql("vehicles", ("name", "model", "rent_rate"), len(batch)),
+                [value for i in batch for value in (f"bench-{i}", "bench", 10)],
+            )
+            vehicle_ids += [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(
+            "SELECT id FROM users WHERE username LIKE %s ORDER BY id", ("bench-%",)
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+        for batch in chunked(list(range(len(user_ids), size)), 1000):
+            cursor.execute(
+                insert_many_sql("users", ("username", "vehicle_id"), len(batch)),
+                [
+                    value
+                    for i in batch
+                    for value in (f"bench-{RUN}-seed-{i}", vehicle_ids[i % size])
+                ],
+            )
+            user_ids += [row[0] for row in cursor.fetchall()]
+        conn.commit()
+    finally:
+        conn.close()
+    return {"vehicles": vehicle_ids[:size], "users": user_ids[:size]}
+
+
+def cleanup():
+    """Delete every bench row, including the ones the load test created"""
+    from python_api_backend.db import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM users WHERE username LIKE %s", ("bench-%",))
+        cursor.execute("DELETE FROM vehicles WHERE model = 'bench'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# -- HTTP load --------------------------------------------------------------
+
+
+class ServerProcess:
+    """The API server in a child process, off the load generator's GIL"""
+
+    def __init__(self, port, mode, fake_rows=None):
+        self.port = port
+        command = [sys.executable, os.path.abspath(__file__), "serve"]
+        command += ["--port", str(port), "--mode", mode]
+        if fake_rows is not None:
+            command += ["--fake-rows", str(fake_rows)]
+        self.process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+
+    def wait_ready(self, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+                conn.request("GET", "/metrics")
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("Server did not start in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def load(port, endpoint, ids, concurrency, duration, headers, counter):
+    """Drive one endpoint from ``concurrency`` keep-alive connections"""
+    method, pattern, table = endpoint
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def client(slot):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        start_barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            path, body = make_request(method, pattern, table, next(counter), ids)
+            payload = None if body is None else json.dumps(body).encode()
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                failed = True
+            latencies[slot].append(time.perf_counter() - started)
+            errors[slot] += failed
+        conn.close()
+
+    threads = [
+        threading.Thread(target=client, args=(slot,)) for slot in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    deadline[0] = began + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    ordered = sorted(itertools.chain.from_iterable(latencies))
+    return {
+        "requests": len(ordered),
+        "errors": sum(errors),
+        "rps": len(ordered) / elapsed,
+        "p50_ms": percentile(ordered, 0.50) * 1000 if ordered else None,
+        "p99_ms": percentile(ordered, 0.99) * 1000 if ordered else None,
+    }
+
+
+def warm_up(port, endpoint, ids, requests, headers, counter):
+    method, pattern, table = endpoint
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    for _ in range(requests):
+        path, body = make_request(method, pattern, table, next(counter), ids)
+        payload = None if body is None else json.dumps(body).encode()
+        conn.request(method, path, body=payload, headers=headers)
+        conn.getresponse().read()
+    conn.close()
+
+
+def bench_http(args):
+    headers = {"Content-Type": "application/json"}
+    if args.accept_encoding:
+        headers["Accept-Encoding"] = args.accept_encoding
+    counter = itertools.count()
+    results = []
+    try:
+        for size in args.sizes:
+            if args.fake:
+                ids = {"vehicles": list(range(1, size + 1))}
+                ids["users"] = ids["vehicles"]
+            else:
+                ids = seed(size)
+            server = ServerProcess(args.port, args.mode, size if args.fake else None)
+            try:
+                server.wait_ready()
+                for endpoint in endpoints():
+                    warm_up(args.port, endpoint, ids, args.warmup, headers, counter)
+                    for concurrency in args.concurrency:
+                        result = load(
+                            args.port,
+                            endpoint,
+                            ids,
+                            concurrency,
+                            args.duration,
+                            headers,
+                            counter,
+                        )
+                        result.update(
+                            method=endpoint[0],
+                            route=endpoint[1],
+                            rows=size,
+                            concurrency=concurrency,
+                        )
+                        print(
+                            f"{endpoint[0]:<5} {endpoint[1]:<40} rows={size:<7} "
+                            f"c={concurrency:<4} {result['rps']:>9.0f} req/s "
+                            f"p50={result['p50_ms'] or 0:.2f}ms "
+                            f"p99={result['p99_ms'] or 0:.2f}ms "
+                            f"errors={result['errors']}",
+                            file=sys.stderr,
+                        )
+                        results.append(result)
+            finally:
+                server.stop()
+    finally:
+        if not args.fake:
+            cleanup()
+    return results
+
+
+# -- results ----------------------------------------------------------------
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    groups = set(args.only)
+    results = {
+        "meta": {
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "fake": args.fake,
+            "mode": args.mode,
+            "sizes": args.sizes,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+        }
+    }
+    if "startup" in groups:
+        results["startup"] = bench_startup()
+    if "router" in groups:
+        results["router"] = bench_router()
+    if "serializer" in groups:
+        results["serializer"] = bench_serializer(args.sizes)
+    if "http" in groups:
+        results["http"] = bench_http(args)
+
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+
+
+def flatten(results):
+    """``name -> (value, higher_is_better)`` for every comparable number"""
+    metrics = {}
+    startup = results.get("startup")
+    if startup:
+        metrics["startup import ms"] = (startup["import_ms"], False)
+        metrics["startup app import ms"] = (startup["app_import_ms"], False)
+        metrics["startup rss MB"] = (startup["rss_mb"], False)
+        metrics["startup modules"] = (startup["modules"], False)
+    for item in results.get("router", []):
+        name = f"router {item['method']} {item['route']} ns/op"
+        metrics[name] = (item["ns_per_op"], False)
+    for item in results.get("serializer", []):
+        name = f"serializer {item['case']} rows={item['rows']} rows/s"
+        metrics[name] = (item["rows_per_sec"], True)
+    for item in results.get("http", []):
+        name = (
+            f"http {item['method']} {item['route']} rows={item['rows']} "
+            f"c={item['concurrency']}"
+        )
+        metrics[f"{name} req/s"] = (item["rps"], True)
+        if item["p99_ms"] is not None:
+            metrics[f"{name} p99 ms"] = (item["p99_ms"], False)
+    return metrics
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        before = flatten(json.load(f))
+    with open(args.current) as f:
+        after = flatten(json.load(f))
+
+    regressions = 0
+    for name in sorted(before.keys() & after.keys()):
+        old, higher_is_better = before[name]
+        new, _ = after[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        if abs(change) < args.threshold:
+            continue
+        worse = change < 0 if higher_is_better else change > 0
+        regressions += worse
+        label = "REGRESSION" if worse else "improved"
+        print(f"{label:<10} {change:+7.1%}  {name}: {old:.4g} -> {new:.4g}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def serve(args):
+    """Child process entry point used by ServerProcess"""
+    if args.fake_rows is not None:
+        from benchmarks.fakedb import FakeDatabase
+        from python_api_backend.pool import configure_pool
+
+        configure_pool(connect=FakeDatabase.seeded(args.fake_rows).connect)
+    from python_api_backend.server import run_server
+
+    run_server("127.0.0.1", args.port, mode=args.mode)
+
+
+def integers(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--fake", action="store_true", help="use the in-memory fake connection"
+    )
+    run_parser.add_argument("--sizes", type=integers, default=list(SIZES))
+    run_parser.add_argument("--concurrency", type=integers, default=list(CONCURRENCY))
+    run_parser.add_argument("--duration", type=float, default=DURATION)
+    run_parser.add_argument("--warmup", type=int, default=WARMUP)
+    run_parser.add_argument("--mode", default="thread", help="server mode")
+    run_parser.add_argument("--port", type=int, default=8765)
+    run_parser.add_argument(
+        "--accept-encoding", default="", help="Accept-Encoding sent by clients"
+    )
+    run_parser.add_argument(
+        "--only",
+        type=lambda value: value.split(","),
+        default=["startup", "router", "serializer", "http"],
+        help="comma-separated groups: startup, router, serializer, http",
+    )
+    run_parser.add_argument("--output", help="write JSON here instead of stdout")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("--port", type=int, required=True)
+    serve_parser.add_argument("--mode", default="thread")
+    serve_parser.add_argument("--fake-rows", type=int)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        sys.exit(compare(args))
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
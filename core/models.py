@@ -1,10 +1,12 @@
-from base.base_model import BaseModel
+from base.base_model import BaseModel, to_float, to_iso
 
 
 class Vehicle(BaseModel):
     """Vehicle model"""
 
+    __slots__ = ("id", "name", "model", "rent_rate", "created_at", "updated_at")
     table_name = "vehicles"
+    converters = {"rent_rate": to_float, "created_at": to_iso, "updated_at": to_iso}
 
     def __init__(
         self,
@@ -38,7 +40,9 @@ class Vehicle(BaseModel):
 class User(BaseModel):
     """User model"""
 
+    __slots__ = ("id", "username", "vehicle_id", "created_at", "updated_at")
     table_name = "users"
+    converters = {"created_at": to_iso, "updated_at": to_iso}
 
     def __init__(
         self, id=None, username=None, vehicle_id=None, created_at=None, updated_at=None
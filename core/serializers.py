@@ -4,18 +4,14 @@ from base.base_serializer import BaseSerializer
 class VehicleSerializer(BaseSerializer):
     """Serializes Vehicle data between JSON and Python objects"""
 
-    @staticmethod
-    def deserialize(json_data):
-        """Convert JSON to Python dict for database operations"""
-        allowed_fields = ["name", "model", "rent_rate"]
-        return {k: v for k, v in json_data.items() if k in allowed_fields}
+    allowed_fields = ["name", "model", "rent_rate"]
+    required_fields = ["name", "model", "rent_rate"]
+    field_types = {"name": str, "model": str, "rent_rate": (int, float)}
 
 
 class UserSerializer(BaseSerializer):
     """Serializes User data between JSON and Python objects"""
 
-    @staticmethod
-    def deserialize(json_data):
-        """Convert JSON to Python dict for database operations"""
-        allowed_fields = ["username", "vehicle_id"]
-        return {k: v for k, v in json_data.items() if k in allowed_fields}
+    allowed_fields = ["username", "vehicle_id"]
+    required_fields = ["username"]
+    field_types = {"username": str, "vehicle_id": int}
@@ -1,9 +1,12 @@
 from base import (
+    BaseBulkApiView,
     BaseCreateApiView,
     BaseListApiView,
     BaseRetrieveApiView,
     BaseUpdateApiView,
 )
+from base.expand import Relation
+from base.filters import parse_datetime
 from core.models import User, Vehicle
 from core.serializers import UserSerializer, VehicleSerializer
 
@@ -26,24 +29,33 @@ class VehicleListApiView(BaseListApiView):
     #     }
     table_name = "vehicles"
     model_class = Vehicle
+    filter_fields = {
+        "model": (str, ("eq", "in")),
+        "rent_rate": (float, ("eq", "gt", "gte", "lt", "lte")),
+        "created_at": (parse_datetime, ("gt", "gte", "lt", "lte")),
+    }
+    ordering_fields = ("rent_rate", "created_at")
 
 
 class VehicleCreateApiView(BaseCreateApiView):
     """Handle list operations for vehicles"""
 
+    model_class = Vehicle
+
     def post(self, request):
         """POST /api/vehicles - Create a new vehicle"""
         data = VehicleSerializer.deserialize(request["body"])
 
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO vehicles (name, model, rent_rate) VALUES (%s, %s, %s)",
-            (data.get("name"), data.get("model"), data.get("rent_rate")),
-        )
-        conn.commit()
-        vehicle_id = cursor.lastrowid
-        conn.close()
+        def insert(cursor):
+            cursor.execute(
+                "INSERT INTO vehicles (name, model, rent_rate) VALUES (%s, %s, %s) "
+                "RETURNING id",
+                (data.get("name"), data.get("model"), data.get("rent_rate")),
+            )
+            return cursor.fetchone()[0]
+
+        vehicle_id = self.run_write(insert)
+        self.invalidate(vehicle_id)
 
         return 201, {
             "data": [
@@ -58,37 +70,55 @@ class VehicleCreateApiView(BaseCreateApiView):
 class VehicleRetrieveApiView(BaseRetrieveApiView):
     """Handle retrieve, update and delete operations for a single vehicle"""
 
+    table_name = "vehicles"
+    model_class = Vehicle
+
     def get(self, request, vehicle_id):
         """GET /api/vehicles/{id} - Retrieve a vehicle"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vehicles WHERE id = %s", (vehicle_id,))
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            vehicle = Vehicle.from_db_row(row)
-            return 200, {
-                "data": [vehicle.to_dict()],
-                "message": "Vehicle retrieved successfully",
-            }
+        is_valid, error = self.validate_query_params(request)
+        if not is_valid:
+            return 400, {"error": error}
+
+        not_modified = self.check_not_modified(request, vehicle_id)
+        if not_modified is not None:
+            return not_modified
+
+        vehicle = self.get_object(vehicle_id)
+
+        if vehicle:
+            return (
+                200,
+                {
+                    "data": [self.project(vehicle)],
+                    "message": "Vehicle retrieved successfully",
+                },
+                self.get_validators(vehicle),
+            )
         return 404, {"error": "Vehicle not found"}
 
 
 class VehicleUpdateApiView(BaseUpdateApiView):
+    model_class = Vehicle
+
     def put(self, request, vehicle_id):
         """PUT /api/vehicles/{id} - Update a vehicle"""
         data = VehicleSerializer.deserialize(request["body"])
 
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE vehicles SET name = %s, model = %s rent_rate = %s WHERE id = %s",
-            (data.get("name"), data.get("model"), data.get("rent_rate"), vehicle_id),
-        )
-        conn.commit()
-        rows_affected = cursor.rowcount
-        conn.close()
+        def update(cursor):
+            cursor.execute(
+                "UPDATE vehicles SET name = %s, model = %s, rent_rate = %s, "
+                "updated_at = clock_timestamp() WHERE id = %s",
+                (
+                    data.get("name"),
+                    data.get("model"),
+                    data.get("rent_rate"),
+                    vehicle_id,
+                ),
+            )
+            return cursor.rowcount
+
+        rows_affected = self.run_write(update)
+        self.invalidate(vehicle_id)
 
         if rows_affected > 0:
             return 200, {"message": "Vehicle updated"}
@@ -108,35 +138,43 @@ class VehicleUpdateApiView(BaseUpdateApiView):
     #     return 404, {'error': 'Vehicle not found'}
 
 
-class UserListApiView(BaseListApiView):
-    """Handle list and create operations for users"""
+class VehicleBulkApiView(BaseBulkApiView):
+    """POST /api/vehicles/bulk - create, PUT - update many vehicles"""
+
+    table_name = "vehicles"
+    model_class = Vehicle
+    serializer_class = VehicleSerializer
+
 
-    def get(self, request):
-        """GET /api/users - List all users"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users")
-        rows = cursor.fetchall()
-        conn.close()
+class UserListApiView(BaseListApiView):
+    """Handle list operations for users"""
 
-        users = [User.from_db_row(row) for row in rows]
-        return 200, [u.to_dict() for u in users]
+    table_name = "users"
+    model_class = User
+    relations = {"vehicle": Relation("vehicle_id", Vehicle)}
+    filter_fields = {
+        "vehicle_id": (int, ("eq", "in")),
+        "created_at": (parse_datetime, ("gt", "gte", "lt", "lte")),
+    }
+    ordering_fields = ("created_at",)
 
 
 class UserCreateApiView(BaseCreateApiView):
+    model_class = User
+
     def post(self, request):
         """POST /api/users - Create a new user"""
         data = UserSerializer.deserialize(request["body"])
 
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO users (username, vehicle_id) VALUES (%s, %s)",
-            (data.get("username"), data.get("vehicle_id")),
-        )
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
+        def insert(cursor):
+            cursor.execute(
+                "INSERT INTO users (username, vehicle_id) VALUES (%s, %s) RETURNING id",
+                (data.get("username"), data.get("vehicle_id")),
+            )
+            return cursor.fetchone()[0]
+
+        user_id = self.run_write(insert)
+        self.invalidate(user_id)
 
         return 201, {"id": user_id, "message": "User created"}
 
@@ -144,34 +182,44 @@ class UserCreateApiView(BaseCreateApiView):
 class UserRetrieveApiView(BaseRetrieveApiView):
     """Handle retrieve, update and delete operations for a single user"""
 
+    table_name = "users"
+    model_class = User
+    relations = {"vehicle": Relation("vehicle_id", Vehicle)}
+
     def get(self, request, user_id):
         """GET /api/users/{id} - Retrieve a user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            user = User.from_db_row(row)
-            return 200, user.to_dict()
+        is_valid, error = self.validate_query_params(request)
+        if not is_valid:
+            return 400, {"error": error}
+
+        not_modified = self.check_not_modified(request, user_id)
+        if not_modified is not None:
+            return not_modified
+
+        user = self.get_object(user_id)
+
+        if user:
+            return 200, self.project(user), self.get_validators(user)
         return 404, {"error": "User not found"}
 
 
 class UserUpdateApiView(BaseUpdateApiView):
+    model_class = User
+
     def put(self, request, user_id):
         """PUT /api/users/{id} - Update a user"""
         data = UserSerializer.deserialize(request["body"])
 
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET username = %s, vehicle_id = %s WHERE id = %s",
-            (data.get("username"), data.get("vehicle_id"), user_id),
-        )
-        conn.commit()
-        rows_affected = cursor.rowcount
-        conn.close()
+        def update(cursor):
+            cursor.execute(
+                "UPDATE users SET username = %s, vehicle_id = %s, "
+                "updated_at = clock_timestamp() WHERE id = %s",
+                (data.get("username"), data.get("vehicle_id"), user_id),
+            )
+            return cursor.rowcount
+
+        rows_affected = self.run_write(update)
+        self.invalidate(user_id)
 
         if rows_affected > 0:
             return 200, {"message": "User updated"}
@@ -189,3 +237,29 @@ class UserUpdateApiView(BaseUpdateApiView):
     #     if rows_affected > 0:
     #         return 200, {'message': 'User deleted'}
     #     return 404, {'error': 'User not found'}
+
+
+class UserBulkApiView(BaseBulkApiView):
+    """POST /api/users/bulk - create, PUT - update many users"""
+
+    table_name = "users"
+    model_class = User
+    serializer_class = UserSerializer
+
+    def check_references(self, cursor, valid):
+        vehicle_ids = {
+            data["vehicle_id"]
+            for _, data in valid
+            if data.get("vehicle_id") is not None
+        }
+        if not vehicle_ids:
+            return {}
+        cursor.execute(
+            "SELECT id FROM vehicles WHERE id = ANY(%s)", (sorted(vehicle_ids),)
+        )
+        found = {row[0] for row in cursor.fetchall()}
+        return {
+            index: f"Vehicle {data['vehicle_id']} not found"
+            for index, data in valid
+            if data.get("vehicle_id") is not None and data["vehicle_id"] not in found
+        }
@@ -0,0 +1,111 @@
+"""Buffered, sampled access log
+
+Serving threads and the event loop only append a tuple to an in-memory
+buffer; a background thread formats the lines and writes them out in one
+batch every ACCESS_LOG_FLUSH_INTERVAL seconds, so a slow or blocked stdout
+never holds up a response. When the buffer is full, lines are dropped and
+counted rather than waited on. With ACCESS_LOG_SAMPLE_RATE below 1 only
+that fraction of requests is logged, but server errors always are.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from .settings import (
+    ACCESS_LOG_BUFFER_SIZE,
+    ACCESS_LOG_ENABLED,
+    ACCESS_LOG_FLUSH_INTERVAL,
+    ACCESS_LOG_SAMPLE_RATE,
+)
+
+
+class AccessLogger:
+    """Non-blocking logger draining its buffer from a daemon thread"""
+
+    def __init__(
+        self,
+        enabled=ACCESS_LOG_ENABLED,
+        sample_rate=ACCESS_LOG_SAMPLE_RATE,
+        buffer_size=ACCESS_LOG_BUFFER_SIZE,
+        flush_interval=ACCESS_LOG_FLUSH_INTERVAL,
+        stream=None,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.stream = stream
+        self.dropped = 0
+        self._buffer = deque()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # The writer thread does not survive fork(), so it is started lazily
+        # in whichever process logs first
+        self._writer_pid = None
+
+    def request(self, client, method, target, version, status, seconds):
+        """Log one answered request, subject to sampling"""
+        if not self.enabled:
+            return
+        if status < 500 and self.sample_rate < 1.0:
+            if random.random() >= self.sample_rate:
+                return
+        self._append((client, method, target, version, status, seconds))
+
+    def message(self, client, text):
+        """Log a server message (bad request lines, timeouts); never sampled"""
+        self._append((client, text))
+
+    def flush(self):
+        """Write out everything buffered so far"""
+        with self._flush_lock:
+            lines = [
+                self._format(self._buffer.popleft()) for _ in range(len(self._buffer))
+            ]
+            if self.dropped:
+                lines.append(f"access log: dropped {self.dropped} lines")
+                self.dropped = 0
+            if not lines:
+                return
+            stream = self.stream or sys.stdout
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+
+    def _append(self, entry):
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped += 1
+            return
+        self._buffer.append(entry)
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+
+    def _start_writer(self):
+        with self._start_lock:
+            if self._writer_pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name="access-log", daemon=True).start()
+            self._writer_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    @staticmethod
+    def _format(entry):
+        if len(entry) == 2:
+            return f"{entry[0]} - {entry[1]}"
+        client, method, target, version, status, seconds = entry
+        return (
+            f'{client} - "{method} {target} {version}" {status} {seconds * 1000:.1f}ms'
+        )
+
+
+access_log = AccessLogger()
@@ -0,0 +1,350 @@
+"""Admission control in front of dispatch
+
+Every request passes two gates before it is dispatched:
+
+- A token bucket per client (the ADMISSION_CLIENT_HEADER value, such as an
+  API key, or else the client address) refills at ADMISSION_RATE requests
+  per second up to ADMISSION_BURST. A client that runs dry gets a 429.
+- At most ADMISSION_MAX_IN_FLIGHT requests run at once. Others wait in a
+  queue of at most ADMISSION_MAX_QUEUE for up to ADMISSION_QUEUE_TIMEOUT
+  seconds. A request that finds the queue full, or waits too long, gets a
+  503 straight away. When the database slows down, the excess is shed and
+  admitted requests keep a bounded latency, instead of every request
+  queueing until it times out.
+
+Both rejections carry Retry-After. With ADMISSION_PRIORITY set to
+``reads`` or ``writes``, waiting requests of that class are let in first.
+Paths in ADMISSION_EXEMPT_PATHS (/metrics by default) skip both gates.
+Limits are per process: prefork workers each enforce their own.
+
+The thread and prefork servers run each request on one of SERVER_THREADS
+threads, which caps what can be in flight and would leave a request queued
+in ``admit`` holding a thread. There the queue is the server's hand-off
+queue instead (see ``thread_pool_admission``): connections are shed with
+the 503 when it is full or when they waited in it too long, before any
+thread is spent on them, and ADMISSION_PRIORITY does not apply.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from .protocol import get_header
+from .settings import (
+    ADMISSION_BURST,
+    ADMISSION_CLIENT_HEADER,
+    ADMISSION_EXEMPT_PATHS,
+    ADMISSION_MAX_CLIENTS,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_PRIORITY,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_RATE,
+)
+
+READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+PRIORITIES = ("none", "reads", "writes")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused before it reaches a view"""
+
+    def __init__(self, status_code, message, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.data = {"error": message}
+        self.headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+class TokenBuckets:
+    """One token bucket per client, the least recently seen evicted first"""
+
+    def __init__(self, rate, burst, max_clients=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Take a token; return 0, or the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                elapsed = now - bucket[1]
+                bucket[0] = min(self.burst, bucket[0] + elapsed * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted", "cancelled")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class ConcurrencyLimit:
+    """Counting semaphore with a bounded, prioritised wait queue
+
+    A released slot is handed straight to the first waiter (lowest
+    priority number, then arrival order), so a newcomer cannot overtake
+    the queue. Sync and asyncio callers share one limit.
+    """
+
+    def __init__(self, max_in_flight, max_queue, timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.running = 0
+        self.queued = 0
+        self._waiters = []  # heap of (priority, seq, _Waiter)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _enter(self, priority, make_wake):
+        """Take a slot, or queue a waiter; return None or the waiter"""
+        with self._lock:
+            if self.running < self.max_in_flight:
+                self.running += 1
+                return None
+            if self.queued >= self.max_queue:
+                raise AdmissionRejected(503, "Server busy", self.timeout)
+            waiter = _Waiter(make_wake())
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            self.queued += 1
+            return waiter
+
+    def _leave(self, waiter):
+        """Leave the queue; return True if a slot was handed over meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            self.queued -= 1
+            return False
+
+    def _give_up(self, waiter):
+        if not self._leave(waiter):
+            raise AdmissionRejected(
+                503, "Server busy, timed out in queue", self.timeout
+            )
+
+    def acquire(self, priority=0):
+        """Block until a slot is free; raise AdmissionRejected if none comes"""
+        event = None
+
+        def make_wake():
+            nonlocal event
+            event = threading.Event()
+            return event.set
+
+        waiter = self._enter(priority, make_wake)
+        if waiter is not None and not event.wait(self.timeout):
+            self._give_up(waiter)
+
+    async def acquire_async(self, priority=0):
+        """asyncio version of ``acquire``"""
+        loop = asyncio.get_running_loop()
+        future = None
+
+        def make_wake():
+            nonlocal future
+            future = loop.create_future()
+            return lambda: loop.call_soon_threadsafe(_resolve, future)
+
+        waiter = self._enter(priority, make_wake)
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except TimeoutError:
+            self._give_up(waiter)
+        except asyncio.CancelledError:
+            # The client went away while queued: do not leak the slot
+            if self._leave(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        """Free a slot, handing it to the first live waiter if any"""
+        with self._lock:
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if not waiter.cancelled:
+                    waiter.granted = True
+                    self.queued -= 1
+                    break
+            else:
+                self.running -= 1
+                return
+        waiter.wake()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _no_release():
+    pass
+
+
+class AdmissionController:
+    """Applies the rate limit and the concurrency limit to a request"""
+
+    def __init__(
+        self,
+        rate=ADMISSION_RATE,
+        burst=ADMISSION_BURST,
+        max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+        max_queue=ADMISSION_MAX_QUEUE,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+        priority=ADMISSION_PRIORITY,
+        client_header=ADMISSION_CLIENT_HEADER,
+        exempt_paths=ADMISSION_EXEMPT_PATHS,
+        max_clients=ADMISSION_MAX_CLIENTS,
+    ):
+        if priority not in PRIORITIES:
+            raise ValueError(
+                f"ADMISSION_PRIORITY must be one of {', '.join(PRIORITIES)}"
+            )
+        self.buckets = TokenBuckets(rate, burst, max_clients) if rate > 0 else None
+        self.limit = (
+            ConcurrencyLimit(max_in_flight, max_queue, queue_timeout)
+            if max_in_flight > 0
+            else None
+        )
+        self.priority = priority
+        self.client_header = client_header
+        self.exempt_paths = frozenset(exempt_paths)
+        self._stats = {"admitted": 0, "rate_limited": 0, "shed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _check(self, client, method, target, headers):
+        """Apply the rate limit; return the queue priority, or None if exempt"""
+        if target.partition("?")[0] in self.exempt_paths:
+            return None
+        if self.buckets is not None:
+            key = client
+            if self.client_header:
+                key = get_header(headers, self.client_header) or client
+            wait = self.buckets.take(key)
+            if wait:
+                self._count("rate_limited")
+                raise AdmissionRejected(429, "Too many requests", wait)
+        if self.priority == "none":
+            return 0
+        is_read = method in READ_METHODS
+        return 0 if is_read == (self.priority == "reads") else 1
+
+    def admit(self, client, method, target, headers):
+        """Wait for the request's turn and return the function releasing it
+
+        Raises AdmissionRejected when it is refused instead.
+        """
+        priority = self._check(client, method, target, headers)
+        if priority is None:
+            return _no_release
+        if self.limit is None:
+            self._count("admitted")
+            return _no_release
+        try:
+            self.limit.acquire(priority)
+        except AdmissionRejected:
+            self._count("shed")
+            raise
+        self._count("admitted")
+        return self.limit.release
+
+    async def admit_async(self, client, method, target, headers):
+        """asyncio version of ``admit``"""
+        priority = self._check(client, method, target, headers)
+        if priority is None:
+            return _no_release
+        if self.limit is None:
+            self._count("admitted")
+            return _no_release
+        try:
+            await self.limit.acquire_async(priority)
+        except AdmissionRejected:
+            self._count("shed")
+            raise
+        self._count("admitted")
+        return self.limit.release
+
+    def record_shed(self):
+        """Count a request the server shed before it could reach ``admit``"""
+        self._count("shed")
+
+    def get_stats(self):
+        """Counters plus the current in-flight and queued gauges"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = self.limit.running if self.limit else 0
+        stats["queued"] = self.limit.queued if self.limit else 0
+        stats["clients"] = len(self.buckets) if self.buckets else 0
+        return stats
+
+
+_controller = None
+_controller_lock = threading.Lock()
+_controller_options = {}
+
+
+def configure_admission(**options):
+    """Override settings for the process-wide controller before it is created"""
+    _controller_options.update(options)
+
+
+def thread_pool_admission(threads):
+    """Set admission up for a server running requests on ``threads`` threads
+
+    At most ``threads`` requests can be in flight, so the in-flight limit is
+    capped at that and never queues. Returns the size and timeout for the
+    server's hand-off queue, or ``(None, None)`` when ADMISSION_MAX_IN_FLIGHT
+    leaves concurrency unbounded.
+    """
+    if ADMISSION_MAX_IN_FLIGHT <= 0:
+        return None, None
+    configure_admission(
+        max_in_flight=min(ADMISSION_MAX_IN_FLIGHT, threads), max_queue=0
+    )
+    return max(1, ADMISSION_MAX_QUEUE), ADMISSION_QUEUE_TIMEOUT
+
+
+def get_admission():
+    """Return the process-wide admission controller, creating it on first use"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(**_controller_options)
+    return _controller
+
+
+def get_admission_stats():
+    """Stats of the controller if it was created; this never creates it"""
+    return _controller.get_stats() if _controller is not None else {}
@@ -0,0 +1,255 @@
+"""asyncio serving engine
+
+Serves many keep-alive clients from one event loop. Views whose handlers
+are ``async def`` run on the loop and use the async connection pool;
+existing sync views run unchanged in a thread pool executor, so routes can
+be migrated one at a time.
+"""
+
+import asyncio
+import functools
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from base.streaming import StreamingResponse
+from python_api_backend.access_log import access_log
+from python_api_backend.admission import AdmissionRejected, get_admission
+from python_api_backend.compression import encode_body, encode_stream
+from python_api_backend.deadlines import request_deadline
+from python_api_backend.dispatch import dispatch_async, log_exception
+from python_api_backend.metrics import RequestTimer, in_flight, record_request
+from python_api_backend.pool import close_async_pool, close_pool
+from python_api_backend.protocol import (
+    CONTINUE,
+    LAST_CHUNK,
+    NO_BODY_STATUSES,
+    HTTPError,
+    encode_chunk,
+    parse_request_head,
+    render_head,
+    render_response,
+    wants_keep_alive,
+)
+from python_api_backend.replicas import close_router
+from python_api_backend.settings import (
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_KEEPALIVE_TIMEOUT,
+    SERVER_MAX_BODY_SIZE,
+    SERVER_MAX_HEADER_SIZE,
+    SERVER_MAX_KEEPALIVE_REQUESTS,
+    SERVER_THREADS,
+)
+from python_api_backend.urls import URLRouter
+
+
+class AsyncAPIServer:
+    """HTTP/1.1 server running the API views on an asyncio event loop"""
+
+    def __init__(
+        self,
+        host,
+        port,
+        router=None,
+        threads=SERVER_THREADS,
+        keepalive_timeout=SERVER_KEEPALIVE_TIMEOUT,
+        max_keepalive_requests=SERVER_MAX_KEEPALIVE_REQUESTS,
+    ):
+        self.host = host
+        self.port = port
+        self.router = router or URLRouter()
+        self.keepalive_timeout = keepalive_timeout
+        self.max_keepalive_requests = max_keepalive_requests
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="sync-view"
+        )
+        self._connections = set()
+        self._server = None
+
+    async def run_sync(self, func, *args):
+        """Executor adapter running a blocking view handler off the loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one client connection until it closes"""
+        task = asyncio.current_task()
+        self._connections.add(task)
+        peer = writer.get_extra_info("peername")
+        try:
+            # Requests are read and answered in order, which also serves
+            # pipelined requests already sitting in the read buffer
+            served = 1
+            while await self._handle_request(reader, writer, peer, served):
+                served += 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_request(self, reader, writer, peer, served):
+        """Read, dispatch and answer one request; return whether to continue"""
+        try:
+            head = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout
+            )
+        except (TimeoutError, asyncio.IncompleteReadError):
+            return False
+        except asyncio.LimitOverrunError:
+            await self._send_error(writer, HTTPError(431, "Headers too large"))
+            return False
+
+        try:
+            request = parse_request_head(head[:-4])
+            request.check_body(SERVER_MAX_BODY_SIZE)
+        except HTTPError as exc:
+            await self._send_error(writer, exc)
+            return False
+
+        method, target, version = request.method, request.target, request.version
+        headers = request.headers
+        raw_body = None
+        if request.content_length:
+            if request.expect_continue:
+                writer.write(CONTINUE)
+            raw_body = await reader.readexactly(request.content_length)
+        keep_alive = (
+            wants_keep_alive(version, request.connection)
+            and served < self.max_keepalive_requests
+        )
+
+        timer = RequestTimer()
+        # EOF alone may be a half-close; a closing transport is a broken one
+        deadline = request_deadline(headers, timer.started, writer.transport.is_closing)
+        in_flight.inc()
+        status_code = 500
+        release = None
+        try:
+            try:
+                release = await get_admission().admit_async(
+                    peer[0], method, target, headers
+                )
+            except AdmissionRejected as exc:
+                status_code, data = exc.status_code, exc.data
+                response_headers = exc.headers
+            else:
+                status_code, data, response_headers = await dispatch_async(
+                    self.router,
+                    method,
+                    target,
+                    headers,
+                    raw_body,
+                    self.run_sync,
+                    timer,
+                    peer[0],
+                    deadline,
+                )
+            start = time.perf_counter()
+            if isinstance(data, StreamingResponse):
+                data, response_headers = encode_stream(data, headers, response_headers)
+                start = timer.mark("serialize", start)
+                keep_alive = await self._send_stream(
+                    writer, status_code, data, keep_alive, response_headers
+                )
+            elif status_code in NO_BODY_STATUSES:
+                writer.write(render_head(status_code, keep_alive, response_headers))
+                await writer.drain()
+            else:
+                # Compression can take a while on big pages; keep it off the loop
+                body, response_headers = await self.run_sync(
+                    encode_body, data, headers, response_headers, target
+                )
+                start = timer.mark("serialize", start)
+                writer.write(
+                    render_head(status_code, keep_alive, response_headers, len(body))
+                    + body
+                )
+                await writer.drain()
+            timer.mark("write", start)
+        finally:
+            if release is not None:
+                release()
+            in_flight.dec()
+            record_request(timer, method, status_code)
+            access_log.request(
+                peer[0], method, target, version, status_code, timer.elapsed()
+            )
+        return keep_alive
+
+    async def _send_stream(self, writer, status_code, body, keep_alive, headers):
+        """Write a StreamingResponse with chunked encoding
+
+        The producer is a blocking generator (it reads from a server-side
+        cursor), so each chunk is pulled in the executor. Returns whether
+        the connection can be kept open.
+        """
+        writer.write(render_head(status_code, keep_alive, headers))
+        chunks = iter(body)
+        try:
+            while True:
+                chunk = await self.run_sync(next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    writer.write(encode_chunk(chunk))
+                    await writer.drain()
+        except Exception as exc:
+            log_exception(exc)
+            return False
+        finally:
+            await self.run_sync(body.close)
+        writer.write(LAST_CHUNK)
+        await writer.drain()
+        return keep_alive
+
+    async def _send_error(self, writer, exc):
+        writer.write(render_response(exc.status_code, {"error": exc.message}, False))
+        await writer.drain()
+
+    async def serve_forever(self):
+        """Accept connections until SIGTERM/SIGINT, then shut down gracefully"""
+        self._server = await asyncio.start_server(
+            self.handle_connection,
+            self.host,
+            self.port,
+            limit=SERVER_MAX_HEADER_SIZE,
+            reuse_address=True,
+        )
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stopping.set)
+
+        try:
+            await stopping.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Stop accepting, give open connections time to finish, release pools"""
+        if self._server is not None:
+            self._server.close()
+        if self._connections:
+            _, pending = await asyncio.wait(
+                set(self._connections), timeout=SERVER_GRACEFUL_TIMEOUT
+            )
+            for task in pending:
+                task.cancel()
+        if self._server is not None:
+            await self._server.wait_closed()
+        await close_async_pool()
+        self.executor.shutdown(wait=True)
+        close_router()
+        close_pool()
+        access_log.flush()
+
+
+def run_async_server(host="localhost", port=8000, threads=None):
+    """Run the asyncio engine until interrupted"""
+    server = AsyncAPIServer(host, port, threads=threads or SERVER_THREADS)
+    asyncio.run(server.serve_forever())
@@ -0,0 +1,165 @@
+"""In-process read-through cache for single-object reads"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .settings import CACHE_BACKEND, CACHE_MAX_BYTES, CACHE_MAX_ENTRIES, CACHE_TTL
+
+
+class BaseCache:
+    """Interface every cache backend implements
+
+    ``generation`` is bumped on every invalidation. A read-through caller
+    takes it before querying the database and passes it to ``set``; the
+    value is then dropped if a write invalidated anything in between, so a
+    slow reader cannot put back data older than a concurrent write.
+    """
+
+    generation = 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, generation=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def get_stats(self):
+        return {}
+
+
+class NullCache(BaseCache):
+    """Backend that never stores anything (CACHE_BACKEND=none)"""
+
+
+class LRUCache(BaseCache):
+    """Thread-safe LRU cache with a per-entry TTL and a byte budget
+
+    Entry size is the length of the value's JSON encoding, which is what the
+    entry costs to send and a fair proxy for what it costs to keep; bytes
+    values are sized by their length.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=30.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "stale_sets_skipped": 0,
+        }
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= now:
+                self._remove(key, size)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        """Store a value unless an invalidation happened since ``generation``"""
+        if isinstance(value, (bytes, bytearray)):
+            size = len(value)
+        else:
+            size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self._stats["stale_sets_skipped"] += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def delete(self, key):
+        """Invalidate one key"""
+        with self._lock:
+            self.generation += 1
+            self._stats["invalidations"] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._remove(key, entry[1])
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """Return a snapshot of cache counters and gauges"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+            )
+        return stats
+
+    def _remove(self, key, size):
+        del self._entries[key]
+        self._bytes -= size
+
+
+def cache_key(model_class, pk):
+    """Key for one model instance, e.g. ``vehicles:42``"""
+    return f"{model_class.table_name}:{pk}"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache configured by CACHE_BACKEND
+
+    Each process has its own cache; with prefork workers an update only
+    invalidates the worker that handled it, and other workers converge
+    within CACHE_TTL.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if CACHE_BACKEND == "memory":
+                    _cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL)
+                elif CACHE_BACKEND == "none":
+                    _cache = NullCache()
+                else:
+                    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+    return _cache
@@ -0,0 +1,176 @@
+"""Group commit for concurrent single-row writes
+
+With WRITE_COALESCE_ENABLED, create and update views hand their statement
+to the WriteCoalescer instead of committing on their own connection. The
+first write to arrive waits up to WRITE_COALESCE_WINDOW seconds (or until
+WRITE_COALESCE_MAX_ITEMS writes have queued), then runs the whole batch on
+one connection and commits once, so N concurrent writes cost one WAL flush
+instead of N.
+
+Every write runs under its own SAVEPOINT: a failing write is rolled back
+alone and its caller gets its own exception, while the others still commit
+and get their own results. If the COMMIT itself fails, every caller in the
+batch gets that error, just as each would have from its own commit.
+
+A write submitted with its request's deadline runs its statements with the
+time left as their timeouts, and fails with DeadlineExceeded without
+running if none is left by its turn.
+"""
+
+import threading
+import time
+
+from . import metrics
+from .deadlines import SET_TIMEOUTS
+from .pool import get_pool
+from .settings import WRITE_COALESCE_MAX_ITEMS, WRITE_COALESCE_WINDOW
+
+# Undoes SET_TIMEOUTS for a write without a deadline that follows one
+RESET_TIMEOUTS = (
+    "SET LOCAL statement_timeout TO DEFAULT; SET LOCAL lock_timeout TO DEFAULT"
+)
+
+
+class _Write:
+    __slots__ = ("write", "deadline", "queued_at", "done", "result", "error")
+
+    def __init__(self, write, deadline=None):
+        self.write = write
+        self.deadline = deadline
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WriteCoalescer:
+    """Runs writes submitted by concurrent threads in shared transactions
+
+    There is no background thread: the thread whose write opens a batch
+    collects the others and executes the batch, then wakes its followers.
+    """
+
+    def __init__(
+        self,
+        pool=None,
+        window=WRITE_COALESCE_WINDOW,
+        max_items=WRITE_COALESCE_MAX_ITEMS,
+    ):
+        self._pool = pool
+        self.window = window
+        self.max_items = max_items
+        self._pending = []
+        self._cond = threading.Condition()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    def submit(self, write, deadline=None):
+        """Run ``write(cursor)`` in a shared transaction and return its result
+
+        Raises whatever ``write`` (or the commit) raised.
+        """
+        item = _Write(write, deadline)
+        with self._cond:
+            self._pending.append(item)
+            leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_items:
+                self._cond.notify_all()
+            if leader:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.max_items, self.window
+                )
+                batch, self._pending = self._pending, []
+
+        if leader:
+            self._run(batch)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        metrics.write_batch_size.observe((), len(batch))
+        for item in batch:
+            metrics.write_coalesce_seconds.observe((), started - item.queued_at)
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                if len(batch) == 1:
+                    self._run_alone(conn, cursor, batch[0])
+                else:
+                    limited = False
+                    for item in batch:
+                        limited = self._run_isolated(cursor, item, limited)
+                    conn.commit()
+        except Exception as exc:
+            # Checkout or COMMIT failed: nothing in the batch was written
+            for item in batch:
+                if item.error is None:
+                    item.result, item.error = None, exc
+        finally:
+            for item in batch:
+                item.done.set()
+
+    @staticmethod
+    def _limit(cursor, item, limited=False):
+        """Apply the item's deadline; return whether timeouts are now set
+
+        Raises DeadlineExceeded if the item has no time left.
+        """
+        if item.deadline is not None:
+            item.deadline.check()
+            milliseconds = item.deadline.statement_timeout()
+            if milliseconds is not None:
+                cursor.execute(SET_TIMEOUTS, (milliseconds, milliseconds))
+                return True
+        if limited:
+            cursor.execute(RESET_TIMEOUTS)
+        return False
+
+    @classmethod
+    def _run_alone(cls, conn, cursor, item):
+        try:
+            cls._limit(cursor, item)
+            item.result = item.write(cursor)
+        except Exception as exc:
+            conn.rollback()
+            item.error = exc
+            return
+        conn.commit()
+
+    @classmethod
+    def _run_isolated(cls, cursor, item, limited):
+        """Run one write of a batch; return whether timeouts are set after it"""
+        try:
+            limited = cls._limit(cursor, item, limited)
+        except Exception as exc:
+            item.error = exc
+            return limited
+        cursor.execute("SAVEPOINT coalesced_write")
+        try:
+            item.result = item.write(cursor)
+        except Exception as exc:
+            cursor.execute("ROLLBACK TO SAVEPOINT coalesced_write")
+            item.error = exc
+        else:
+            cursor.execute("RELEASE SAVEPOINT coalesced_write")
+        return limited
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer():
+    """Return the process-wide write coalescer, creating it on first use"""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = WriteCoalescer()
+    return _coalescer
@@ -0,0 +1,170 @@
+"""Response compression negotiated from Accept-Encoding
+
+gzip and deflate use zlib; brotli is offered only when the ``brotli`` (or
+``brotlicffi``) package is installed, and imported the first time a body is
+brotli-encoded. Bodies below COMPRESSION_MIN_SIZE are sent as they are,
+since compressing them costs more than it saves.
+"""
+
+import importlib
+import importlib.util
+import json
+import zlib
+
+from base.streaming import StreamingResponse
+
+from .cache import LRUCache
+from .protocol import get_header
+from .settings import (
+    CACHE_TTL,
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_CACHE_MAX_BYTES,
+    COMPRESSION_ENABLED,
+    COMPRESSION_LEVEL,
+    COMPRESSION_MIN_SIZE,
+)
+
+BROTLI_MODULE = next(
+    (name for name in ("brotli", "brotlicffi") if importlib.util.find_spec(name)),
+    None,
+)
+_brotli = None
+
+# Server preference when the client rates several encodings equally
+ENCODINGS = ("br", "gzip", "deflate") if BROTLI_MODULE else ("gzip", "deflate")
+
+# Compressed bodies of cacheable (ETag-carrying) responses, keyed by
+# encoding, path and ETag, so a repeated hit skips both json.dumps and
+# the compressor. The views' ETags change whenever their body does (list
+# pages hash every row's version, and the count when included), so a
+# changed body never hits a stale entry
+_body_cache = LRUCache(
+    max_entries=10000, max_bytes=COMPRESSION_CACHE_MAX_BYTES, ttl=CACHE_TTL
+)
+
+
+def negotiate(accept_encoding):
+    """Pick the encoding to use for an Accept-Encoding value, or None"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                continue
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _get_brotli():
+    global _brotli
+    if _brotli is None:
+        _brotli = importlib.import_module(BROTLI_MODULE)
+    return _brotli
+
+
+def _compressor(encoding, level):
+    if encoding == "br":
+        return _get_brotli().Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+    # wbits 31 writes a gzip wrapper, 15 a zlib one (HTTP "deflate")
+    wbits = 31 if encoding == "gzip" else 15
+    return zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+
+def compress(body, encoding, level=COMPRESSION_LEVEL):
+    """Compress a complete body"""
+    if encoding == "br":
+        return _get_brotli().compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    compressor = _compressor(encoding, level)
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level=COMPRESSION_LEVEL):
+    """Compress a chunk iterator, flushing after every chunk
+
+    The sync flush keeps each chunk decodable on arrival, so streaming
+    still delivers rows progressively. The source is closed with this
+    generator.
+    """
+    compressor = _compressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if encoding == "br":
+                data = compressor.process(chunk) + compressor.flush()
+            else:
+                data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.finish() if encoding == "br" else compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _to_bytes(data):
+    if isinstance(data, bytes):
+        return data
+    return json.dumps(data).encode("utf-8")
+
+
+def encode_body(data, request_headers, headers, path=None):
+    """Serialize a JSON response body, compressed if the client accepts it
+
+    ``bytes`` data is taken as an already encoded body. Returns ``(body,
+    headers)``, the headers extended with Vary and, when compressed,
+    Content-Encoding.
+    """
+    if not COMPRESSION_ENABLED:
+        return _to_bytes(data), headers
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    encoding = negotiate(get_header(request_headers, "Accept-Encoding"))
+
+    key = None
+    if encoding is not None and path is not None and "ETag" in headers:
+        key = f"{encoding}:{path}:{headers['ETag']}"
+        body = _body_cache.get(key)
+        if body is not None:
+            headers["Content-Encoding"] = encoding
+            return body, headers
+
+    body = _to_bytes(data)
+    if encoding is None or len(body) < COMPRESSION_MIN_SIZE:
+        return body, headers
+    body = compress(body, encoding)
+    headers["Content-Encoding"] = encoding
+    if key is not None:
+        _body_cache.set(key, body)
+    return body, headers
+
+
+def encode_stream(body, request_headers, headers):
+    """Wrap a StreamingResponse in the negotiated encoding, if any
+
+    Returns ``(body, headers)`` like encode_body. Streams have no known
+    size up front, so the minimum size does not apply.
+    """
+    if not COMPRESSION_ENABLED:
+        return body, headers
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    encoding = negotiate(get_header(request_headers, "Accept-Encoding"))
+    if encoding is None:
+        return body, headers
+    headers["Content-Encoding"] = encoding
+    return StreamingResponse(compress_stream(body, encoding)), headers
+
+
+def get_compression_stats():
+    """Counters of the compressed body cache"""
+    return _body_cache.get_stats()
@@ -1,26 +1,266 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+"""PostgreSQL access on psycopg 3, for every view, pool and script
+
+Connections made by ``get_db_connection`` and ``get_async_db_connection``
+share one adapter setup:
+
+- Python ints are sent as bigint, so a statement keeps one parameter type
+  signature and one prepared statement whatever the values.
+- Floats are sent as NUMERIC, so filters on NUMERIC columns can use their
+  indexes.
+
+psycopg prepares a query on the server once it has run
+``DB_PREPARE_THRESHOLD`` times on a connection, keeping at most
+``DB_PREPARED_MAX`` statements. Counting its cache for the metrics hooks
+into psycopg internals, which pyproject pins to the 3.2/3.3 series; with a
+psycopg whose internals moved, statements are still prepared but the
+counters stay at zero. psycopg drops the whole cache on ROLLBACK, so transactions that
+went well are committed, reads included (see ``read_transaction``). Cursors
+also add up the time each thread spends executing queries, which the
+request metrics report as the DB phase.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import psycopg
+from psycopg import DataError, IntegrityError  # noqa: F401 (used by views)
+from psycopg.adapt import AdaptersMap, Dumper, Loader
+from psycopg.errors import LockNotAvailable, QueryCanceled  # noqa: F401 (used by dispatch)
+from psycopg.rows import dict_row
+from psycopg.types.numeric import FloatLoader, Int8Dumper
 
 from .settings import *
 
 
-def get_db_connection():
-    """Create and return a PostgreSQL database connection"""
-    conn = psycopg2.connect(
-        # host=DATABASE_CONFIG['HOST'],
-        # port=DATABASE_CONFIG['PORT'],
-        # database=DATABASE_CONFIG['NAME'],
-        # user=DATABASE_CONFIG['USER'],
-        # password=DATABASE_CONFIG['PASSWORD']
-        host=DB_HOST,
-        port=DB_PORT,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
+class FloatAsNumericDumper(Dumper):
+    """Send floats as NUMERIC, the type Postgres gives a decimal literal
+
+    With float8 parameters ``rent_rate >= %s`` would compare as float8, and
+    the index on the NUMERIC column could not serve it.
+    """
+
+    oid = psycopg.adapters.types["numeric"].oid
+
+    def dump(self, obj):
+        if math.isinf(obj):
+            return b"Infinity" if obj > 0 else b"-Infinity"
+        return repr(obj).encode() if obj == obj else b"NaN"
+
+
+ADAPTERS = AdaptersMap(psycopg.adapters)
+ADAPTERS.register_dumper(int, Int8Dumper)
+ADAPTERS.register_dumper(float, FloatAsNumericDumper)
+
+PREPARE_THRESHOLD = DB_PREPARE_THRESHOLD if DB_PREPARE_THRESHOLD >= 0 else None
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "prepared": 0, "evictions": 0, "resets": 0}
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_statement_stats():
+    """Process-wide prepared statement counters and hit rate"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+# What CountingPrepareManager relies on in psycopg's (private) cache class
+_PREPARE_MANAGER_API = (
+    "get",
+    "maybe_add_to_cache",
+    "_rotate",
+    "clear",
+    "_names",
+    "prepare_threshold",
+    "prepared_max",
+)
+
+try:
+    from psycopg._preparing import Prepare, PrepareManager
+
+    _manager = PrepareManager()
+    _can_count = all(hasattr(_manager, name) for name in _PREPARE_MANAGER_API)
+    del _manager
+except Exception:
+    _can_count = False
+
+if not _can_count:
+    CountingPrepareManager = None
+else:
+
+    class CountingPrepareManager(PrepareManager):
+        """psycopg's prepared statement cache of a connection, counting its work
+
+        Every lookup is a hit or a miss; statements are counted as psycopg
+        prepares them, deallocates the least recently used one, or drops them
+        all (after a ROLLBACK, for instance).
+        """
+
+        def get(self, query, prepare=None):
+            prep, name = super().get(query, prepare)
+            if self.prepare_threshold is not None and prepare is not False:
+                _count("hits" if prep is Prepare.YES else "misses")
+            return prep, name
+
+        def maybe_add_to_cache(self, query, prep, name):
+            if prep is Prepare.SHOULD:
+                _count("prepared")
+            return super().maybe_add_to_cache(query, prep, name)
+
+        def _rotate(self):
+            if len(self._names) > self.prepared_max:
+                _count("evictions")
+            super()._rotate()
+
+        def clear(self):
+            cleared = super().clear()
+            if cleared:
+                _count("resets")
+            return cleared
+
+
+# Seconds the current thread has spent in cursor.execute
+_query_time = threading.local()
+
+
+def take_query_time():
+    """Seconds this thread spent executing queries since the last call"""
+    seconds = getattr(_query_time, "seconds", 0.0)
+    _query_time.seconds = 0.0
+    return seconds
+
+
+def _add_query_time(start):
+    _query_time.seconds = (
+        getattr(_query_time, "seconds", 0.0) + time.perf_counter() - start
     )
+
+
+class TimedCursor(psycopg.Cursor):
+    """Client-side cursor counting its execute time"""
+
+    def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            _add_query_time(start)
+
+
+class TimedServerCursor(psycopg.ServerCursor):
+    """Named (server-side) cursor counting its execute time"""
+
+    def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            _add_query_time(start)
+
+
+class Connection(psycopg.Connection):
+    """psycopg connection handing out timed cursors"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = TimedCursor
+        self.server_cursor_factory = TimedServerCursor
+        if CountingPrepareManager is not None and hasattr(self, "_prepared"):
+            self._prepared = CountingPrepareManager()
+
+
+class AsyncConnection(psycopg.AsyncConnection):
+    """asyncio psycopg connection counting its prepared statements"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if CountingPrepareManager is not None and hasattr(self, "_prepared"):
+            self._prepared = CountingPrepareManager()
+
+
+@contextmanager
+def read_transaction(checkout):
+    """Commit the transaction of a read when its with block exits cleanly
+
+    Checked-in connections have their transaction closed; a ROLLBACK would
+    also make psycopg deallocate every statement prepared on the connection,
+    so hot reads would never stay prepared across requests.
+    """
+    with checkout as conn:
+        yield conn
+        conn.commit()
+
+
+def get_db_connection(dsn=None):
+    """Create and return a PostgreSQL database connection
+
+    ``dsn`` selects another server, such as a read replica; without it the
+    primary is used.
+    """
+    dsn = dsn or DB_PRIMARY_DSN
+    options = {"context": ADAPTERS, "prepare_threshold": PREPARE_THRESHOLD}
+    if dsn:
+        conn = Connection.connect(dsn, **options)
+    else:
+        conn = Connection.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            **options,
+        )
+    conn.prepared_max = DB_PREPARED_MAX
     return conn
 
 
+async def get_async_db_connection():
+    """Create and return an asyncio PostgreSQL connection"""
+    options = {"context": ADAPTERS, "prepare_threshold": PREPARE_THRESHOLD}
+    if DB_PRIMARY_DSN:
+        conn = await AsyncConnection.connect(DB_PRIMARY_DSN, **options)
+    else:
+        conn = await AsyncConnection.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            **options,
+        )
+    conn.prepared_max = DB_PREPARED_MAX
+    return conn
+
+
+# B-tree indexes behind the list endpoints' filters and sorts. Each sortable
+# column is paired with id, the keyset tiebreaker, so one index serves the
+# WHERE, the ORDER BY and the page cursor in both directions.
+INDEXES = {
+    "vehicles": [("model", "id"), ("rent_rate", "id"), ("created_at", "id")],
+    "users": [("vehicle_id", "id"), ("created_at", "id")],
+}
+
+
+def create_indexes(cursor):
+    """Create the INDEXES that are missing"""
+    for table, indexes in INDEXES.items():
+        for columns in indexes:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_{'_'.join(columns)}_idx "
+                f"ON {table} ({', '.join(columns)})"
+            )
+
+
 def init_db():
     """Initialize database tables"""
     conn = get_db_connection()
@@ -34,7 +274,8 @@ def init_db():
             name VARCHAR(255) NOT NULL,
             model VARCHAR(255) NOT NULL,
             rent_rate DECIMAL(10, 2) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """
     )
@@ -47,11 +288,14 @@ def init_db():
             username VARCHAR(255) NOT NULL UNIQUE,
             vehicle_id INTEGER,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (vehicle_id) REFERENCES vehicles(id) ON DELETE SET NULL
         )
     """
     )
 
+    create_indexes(cursor)
+
     conn.commit()
     cursor.close()
     conn.close()
@@ -60,7 +304,46 @@ def init_db():
 
 def get_dict_cursor(conn):
     """Get a cursor that returns results as dictionaries"""
-    return conn.cursor(cursor_factory=RealDictCursor)
+    return conn.cursor(row_factory=dict_row)
+
+
+class TimestampAsIsoLoader(Loader):
+    """timestamp -> ISO string, without building a datetime"""
+
+    def load(self, data):
+        # Postgres prints "2025-01-01 12:30:00.5"; match datetime.isoformat()
+        value = bytes(data).decode().replace(" ", "T", 1)
+        if "." in value and len(value) < 26:
+            value += "0" * (26 - len(value))
+        return value
+
+
+class TimestamptzAsIsoLoader(Loader):
+    """timestamptz -> ISO string"""
+
+    def load(self, data):
+        return datetime.fromisoformat(bytes(data).decode()).isoformat()
+
+
+RECORD_LOADERS = (
+    ("numeric", FloatLoader),
+    ("timestamp", TimestampAsIsoLoader),
+    ("timestamptz", TimestamptzAsIsoLoader),
+)
+
+
+def get_record_cursor(conn, name=None):
+    """Get a cursor whose rows are response-ready dicts keyed by column name
+
+    NUMERIC is decoded straight to float and timestamps straight to ISO
+    strings, skipping the Decimal/datetime objects and the model instance a
+    to_dict would otherwise go through. Meant for read-only paths; with a
+    ``name`` the cursor is a server-side one.
+    """
+    cursor = conn.cursor(name or "", row_factory=dict_row)
+    for type_name, loader in RECORD_LOADERS:
+        cursor.adapters.register_loader(type_name, loader)
+    return cursor
 
 
 def close_db(conn):
@@ -0,0 +1,268 @@
+"""Request deadlines, enforced in Postgres and by cancelling queries
+
+Every request gets a time budget that starts when it is read:
+
+- REQUEST_ROUTE_TIMEOUTS sets it for a route pattern.
+- Otherwise the view's ``request_timeout`` sets it.
+- Otherwise REQUEST_TIMEOUT sets it.
+
+An ``X-Request-Timeout`` header (in seconds) can shorten the budget but
+never extend it.
+
+Each connection a view checks out, through ``connection()``,
+``read_connection()`` or ``async_connection()``, gets the remaining budget
+as ``statement_timeout`` and ``lock_timeout``, local to its transaction. A
+watcher thread also cancels the running query on every connection the
+request holds, once the budget runs out or the client disconnects. Whatever
+the cause, the request fails with DeadlineExceeded and the dispatcher
+answers 504. A write handed to the coalescer only gets the timeouts for its
+own statements: its connection runs other requests' writes too, so it is
+never cancelled.
+
+A streaming response (``?stream=true``) is meant to outlive the budget, so
+it applies to each of its statements instead, such as every batch fetched
+from its server-side cursor. Only a gone client stops the stream.
+"""
+
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from .protocol import get_header
+from .settings import REQUEST_ROUTE_TIMEOUTS, REQUEST_TIMEOUT
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+# How often the watcher looks for expired deadlines and gone clients
+CHECK_INTERVAL = 0.05
+
+# Local to the transaction, so they go back to the defaults at its end
+SET_TIMEOUTS = (
+    "SELECT set_config('statement_timeout', %s, true), "
+    "set_config('lock_timeout', %s, true)"
+)
+
+
+def _parse_route_timeouts(entries):
+    timeouts = {}
+    for entry in entries:
+        pattern, sep, seconds = entry.rpartition("=")
+        if not sep:
+            raise ValueError(
+                f"REQUEST_ROUTE_TIMEOUTS entry {entry!r} is not route=seconds"
+            )
+        timeouts[pattern.strip()] = float(seconds)
+    return timeouts
+
+
+ROUTE_TIMEOUTS = _parse_route_timeouts(REQUEST_ROUTE_TIMEOUTS)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of time or its client goes away"""
+
+
+class Deadline:
+    """The time budget of one request and the connections working for it"""
+
+    __slots__ = (
+        "started",
+        "requested",
+        "expires_at",
+        "budget",
+        "per_statement",
+        "client_gone",
+        "reason",
+        "_connections",
+        "_lock",
+    )
+
+    def __init__(self, started, requested=None, client_gone=None):
+        self.started = started  # time.perf_counter() when the request was read
+        self.requested = requested  # seconds the client asked for, if any
+        self.expires_at = None
+        self.budget = None  # seconds from started, None for no deadline
+        self.per_statement = False  # set for streaming responses
+        self.client_gone = client_gone
+        self.reason = None  # why the watcher cancelled the request's queries
+        self._connections = []
+        self._lock = threading.Lock()
+        self.start(REQUEST_TIMEOUT)
+
+    def start(self, timeout):
+        """Set the budget to ``timeout``, or less if the client asked for less"""
+        budgets = [seconds for seconds in (timeout, self.requested) if seconds]
+        self.budget = min(budgets) if budgets else None
+        self.expires_at = None if self.budget is None else self.started + self.budget
+
+    def stream(self):
+        """Apply the budget to each statement from now on, not to the request"""
+        self.per_statement = True
+        self.expires_at = None
+
+    def remaining(self):
+        """Seconds left, or None without a deadline"""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.perf_counter()
+
+    def check(self):
+        """Raise DeadlineExceeded if the request should stop now"""
+        if self.reason is not None:
+            raise DeadlineExceeded(self.reason)
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def statement_timeout(self):
+        """``statement_timeout`` for the next statements, in ms, or None"""
+        remaining = self.budget if self.per_statement else self.remaining()
+        if remaining is None:
+            return None
+        return str(max(1, int(remaining * 1000)))
+
+    @contextmanager
+    def bind(self, checkout):
+        """Check out ``checkout(timeout)`` under the deadline
+
+        Failures caused by the deadline or a gone client, including the
+        checkout itself timing out, surface as DeadlineExceeded.
+        """
+        self.check()
+        try:
+            with checkout(self.remaining()) as conn:
+                milliseconds = self.statement_timeout()
+                if milliseconds is not None:
+                    conn.cursor().execute(SET_TIMEOUTS, (milliseconds, milliseconds))
+                self._add(conn)
+                try:
+                    yield conn
+                finally:
+                    self._remove(conn)
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:
+            self._raise_if_stopped(exc)
+            raise
+
+    @asynccontextmanager
+    async def bind_async(self, checkout):
+        """asyncio version of ``bind``"""
+        self.check()
+        try:
+            async with checkout(self.remaining()) as conn:
+                milliseconds = self.statement_timeout()
+                if milliseconds is not None:
+                    await conn.cursor().execute(
+                        SET_TIMEOUTS, (milliseconds, milliseconds)
+                    )
+                self._add(conn)
+                try:
+                    yield conn
+                finally:
+                    self._remove(conn)
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:
+            self._raise_if_stopped(exc)
+            raise
+
+    def _raise_if_stopped(self, exc):
+        try:
+            self.check()
+        except DeadlineExceeded as stop:
+            raise stop from exc
+
+    def _add(self, conn):
+        with self._lock:
+            self._connections.append(conn)
+        _watcher.add(self)
+
+    def _remove(self, conn):
+        # Under the lock a cancel in progress finishes first, and none can
+        # start once the connection is on its way back to the pool, where
+        # it would hit another request's statement
+        with self._lock:
+            self._connections.remove(conn)
+            done = not self._connections
+        if done:
+            _watcher.discard(self)
+
+    def _cancel(self, reason):
+        with self._lock:
+            self.reason = reason
+            for conn in self._connections:
+                try:
+                    conn.cancel()
+                except Exception:
+                    pass
+
+
+class _Watcher:
+    """Background thread cancelling queries of requests that must stop"""
+
+    def __init__(self):
+        self._deadlines = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, deadline):
+        if deadline.expires_at is None and deadline.client_gone is None:
+            return
+        with self._lock:
+            self._deadlines.add(deadline)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="deadline-watcher", daemon=True
+                )
+                self._thread.start()
+
+    def discard(self, deadline):
+        with self._lock:
+            self._deadlines.discard(deadline)
+
+    def _run(self):
+        while True:
+            time.sleep(CHECK_INTERVAL)
+            with self._lock:
+                deadlines = list(self._deadlines)
+            now = time.perf_counter()
+            for deadline in deadlines:
+                if deadline.reason is not None:
+                    continue
+                if deadline.expires_at is not None and now >= deadline.expires_at:
+                    deadline._cancel("Request deadline exceeded")
+                elif deadline.client_gone is not None and deadline.client_gone():
+                    deadline._cancel("Client closed the connection")
+
+
+_watcher = _Watcher()
+
+
+def request_deadline(headers, started, client_gone=None):
+    """Deadline of a request, REQUEST_TIMEOUT until its route is known
+
+    A malformed X-Request-Timeout header is ignored.
+    """
+    requested = None
+    value = get_header(headers, TIMEOUT_HEADER)
+    if value:
+        try:
+            requested = float(value)
+        except ValueError:
+            pass
+        else:
+            if not (math.isfinite(requested) and requested > 0):
+                requested = None
+    return Deadline(started, requested, client_gone)
+
+
+def route_timeout(pattern, view_class):
+    """Timeout of a route: REQUEST_ROUTE_TIMEOUTS, the view's, REQUEST_TIMEOUT"""
+    seconds = ROUTE_TIMEOUTS.get(pattern)
+    if seconds is None:
+        seconds = getattr(view_class, "request_timeout", None)
+    if seconds is None:
+        seconds = REQUEST_TIMEOUT
+    return seconds
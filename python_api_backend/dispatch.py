@@ -0,0 +1,151 @@
+"""Transport-independent request dispatching shared by the HTTP servers"""
+
+import json
+import time
+import traceback
+from urllib.parse import parse_qsl
+
+from python_api_backend.db import LockNotAvailable, QueryCanceled
+from python_api_backend.deadlines import DeadlineExceeded, route_timeout
+from python_api_backend.metrics import timed_view
+from python_api_backend.routing import RouteError
+
+
+def parse_body(raw):
+    """Decode a JSON request body, returning None when it is empty"""
+    if not raw:
+        return None
+    # json detects the UTF-8/16/32 encoding of bytes itself
+    return json.loads(raw)
+
+
+def build_request(method, path, headers, body):
+    """Build the request dict handed to view methods
+
+    ``path`` keeps the query string; ``query`` maps each query parameter
+    to its last value.
+    """
+    query_string = path.partition("?")[2]
+    return {
+        "method": method,
+        "path": path,
+        "query": dict(parse_qsl(query_string, keep_blank_values=True)),
+        "headers": headers,
+        "body": body,
+    }
+
+
+def get_handler(router, method, path, timer=None, client=None, deadline=None):
+    """Resolve a request to its bound view method, URL params and async flag
+
+    The matched route pattern is recorded on ``timer``, if given, even when
+    the route does not allow the method. The view, created per request,
+    gets the client address and the deadline, which now takes the route's
+    timeout.
+    """
+    try:
+        route, handler_name, is_async, params = router.match(method, path)
+    except RouteError as exc:
+        if timer is not None and exc.pattern is not None:
+            timer.route = exc.pattern
+        raise
+    if timer is not None:
+        timer.route = route.pattern
+    view = route.view_class()
+    view.client = client
+    if deadline is not None:
+        deadline.start(route_timeout(route.pattern, route.view_class))
+        view.deadline = deadline
+    return getattr(view, handler_name), params, is_async
+
+
+def normalize_result(result):
+    """Accept ``(status, data)`` or ``(status, data, headers)`` from a view"""
+    if len(result) == 2:
+        return result[0], result[1], {}
+    return result
+
+
+def log_exception(exc):
+    """Print an unexpected exception and its traceback"""
+    print("Error", str(exc))
+    traceback.print_exception(exc)
+
+
+def error_response(exc):
+    """Map an exception raised while handling a request to a response"""
+    if isinstance(exc, RouteError):
+        return exc.status_code, exc.data, exc.headers
+    if isinstance(exc, (json.JSONDecodeError, UnicodeDecodeError)):
+        return 400, {"error": "Invalid JSON"}, {}
+    if isinstance(exc, DeadlineExceeded):
+        return 504, {"error": str(exc)}, {}
+    if isinstance(exc, (QueryCanceled, LockNotAvailable)):
+        # statement_timeout or lock_timeout fired just before the deadline
+        return 504, {"error": "Request deadline exceeded"}, {}
+    log_exception(exc)
+    return 500, {"error": str(exc)}, {}
+
+
+def dispatch(
+    router, method, path, headers, raw_body, timer, client=None, deadline=None
+):
+    """Route and run a request synchronously
+
+    Phase durations are recorded on ``timer`` (a metrics.RequestTimer).
+    Returns ``(status, data, headers)``; 504 once ``deadline`` has passed.
+    """
+    try:
+        start = time.perf_counter()
+        request = build_request(method, path, headers, parse_body(raw_body))
+        handler, params, is_async = get_handler(
+            router, method, path, timer, client, deadline
+        )
+        timer.mark("routing", start)
+        if deadline is not None:
+            deadline.check()
+        if is_async:
+            raise RuntimeError(
+                f"{handler.__qualname__} is async and needs SERVER_MODE=asyncio"
+            )
+        return normalize_result(timed_view(timer, handler, request, *params))
+    except Exception as exc:
+        return error_response(exc)
+
+
+async def dispatch_async(
+    router,
+    method,
+    path,
+    headers,
+    raw_body,
+    run_sync,
+    timer,
+    client=None,
+    deadline=None,
+):
+    """Route and run a request on the event loop
+
+    ``async def`` handlers are awaited directly; plain handlers are passed
+    to ``run_sync`` (an executor adapter) so they never block the loop.
+    Returns ``(status, data, headers)``.
+    """
+    try:
+        start = time.perf_counter()
+        request = build_request(method, path, headers, parse_body(raw_body))
+        handler, params, is_async = get_handler(
+            router, method, path, timer, client, deadline
+        )
+        start = timer.mark("routing", start)
+        if deadline is not None:
+            deadline.check()
+        if is_async:
+            # Queries on the async pool are not timed separately
+            result = await handler(request, *params)
+            timer.mark("view", start)
+            return normalize_result(result)
+        return normalize_result(
+            await run_sync(timed_view, timer, handler, request, *params)
+        )
+    except Exception as exc:
+        return error_response(exc)
@@ -0,0 +1,357 @@
+"""Request metrics in the Prometheus text exposition format
+
+Every request is counted by route pattern, method and status, and its
+duration is recorded in histograms, in total and split into phases:
+
+- ``routing``: building the request dict and resolving the view
+- ``db``: time the view spent executing queries
+- ``view``: the rest of the view's own work
+- ``serialize``: JSON encoding and compression of the body
+- ``write``: sending the response; for streamed responses this includes
+  fetching and encoding the rows, which happens as the chunks go out
+
+Pool, cache and prepared statement stats are read when ``/metrics`` is
+scraped. Metrics are kept per process, like the cache: with prefork
+workers each scrape reports the worker that answered it.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from .admission import get_admission_stats
+from .cache import get_cache
+from .compression import get_compression_stats
+from .db import get_statement_stats, take_query_time
+from .pool import get_pool_stats
+from .replicas import get_replica_stats
+from .routing import HTTP_METHODS
+from .settings import METRICS_ENABLED
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Route label of requests that did not resolve to a route (404s, 405s and
+# malformed requests)
+UNMATCHED = "unmatched"
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_items(items))
+        return lines
+
+    def _render_items(self, items):
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, per label set"""
+
+    kind = "gauge"
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    """Observations bucketed by upper bound, with their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per-bucket (non-cumulative) counts, +Inf last, then the sum
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def _render_items(self, items):
+        bounds = self.buckets + (float("inf"),)
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            base = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{base} {_number(state[-1])}"
+            yield f"{self.name}_count{base} {cumulative}"
+
+
+requests_total = Counter(
+    "http_requests_total",
+    "Requests answered, by route, method and status",
+    ("route", "method", "status"),
+)
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time from reading the request to writing the response",
+    ("route",),
+)
+phase_seconds = Histogram(
+    "http_request_phase_seconds",
+    "Request time by phase: routing, db, view, serialize, write",
+    ("route", "phase"),
+)
+in_flight = Gauge("http_requests_in_flight", "Requests currently being served")
+in_flight.set((), 0)
+write_batch_size = Histogram(
+    "db_write_batch_size",
+    "Writes committed together by the write coalescer",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+write_coalesce_seconds = Histogram(
+    "db_write_coalesce_wait_seconds",
+    "Time a coalesced write waited for its batch to start",
+)
+
+METRICS = (
+    requests_total,
+    request_seconds,
+    phase_seconds,
+    in_flight,
+    write_batch_size,
+    write_coalesce_seconds,
+)
+
+
+class RequestTimer:
+    """Route and per-phase durations of one request"""
+
+    __slots__ = ("route", "phases", "started")
+
+    def __init__(self):
+        self.route = UNMATCHED
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def mark(self, phase, since):
+        """Charge the time since ``since`` to ``phase``; return the current time"""
+        now = time.perf_counter()
+        self.add(phase, now - since)
+        return now
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def timed_view(timer, handler, request, *params):
+    """Run a sync view handler, charging its time to the db and view phases
+
+    Must run on the thread that executes the handler's queries.
+    """
+    take_query_time()
+    start = time.perf_counter()
+    try:
+        return handler(request, *params)
+    finally:
+        elapsed = time.perf_counter() - start
+        db = take_query_time()
+        timer.add("db", db)
+        timer.add("view", elapsed - db)
+
+
+def record_request(timer, method, status_code):
+    """Count a finished request and record its durations"""
+    if not METRICS_ENABLED:
+        return
+    route = timer.route
+    if method not in HTTP_METHODS:
+        method = "other"
+    requests_total.inc((route, method, str(status_code)))
+    request_seconds.observe((route,), timer.elapsed())
+    for phase, seconds in timer.phases.items():
+        phase_seconds.observe((route, phase), seconds)
+
+
+def _sample_lines(name, help, kind, samples, labelname=None):
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for label, value in samples:
+        labels = f'{{{labelname}="{_escape(label)}"}}' if labelname else ""
+        lines.append(f"{name}{labels} {_number(value)}")
+    return lines
+
+
+def _stat_lines():
+    """Pool, cache and prepared statement stats, read at scrape time"""
+    lines = []
+    pools = get_pool_stats()
+    routing = get_replica_stats()
+    replicas = routing.get("replicas", {})
+    pools.update(replicas)
+    for key, kind, help in (
+        ("pool_size", "gauge", "Open connections"),
+        ("pool_available", "gauge", "Idle connections"),
+        ("pool_in_use", "gauge", "Connections checked out"),
+        ("requests_waiting", "gauge", "Callers waiting for a connection"),
+        ("checkouts", "counter", "Connections handed out"),
+        ("checkout_timeouts", "counter", "Checkouts that timed out"),
+    ):
+        name = f"db_pool_{key.removeprefix('pool_')}"
+        if kind == "counter":
+            name += "_total"
+        samples = [(pool, stats[key]) for pool, stats in pools.items()]
+        lines += _sample_lines(name, help, kind, samples, "pool")
+
+    if routing:
+        lines += _sample_lines(
+            "db_routed_reads_total",
+            "Reads routed by the replica router, by destination",
+            "counter",
+            [
+                ("primary", routing["primary_reads"]),
+                ("replica", routing["replica_reads"]),
+            ],
+            "node",
+        )
+    for key, kind, help in (
+        ("healthy", "gauge", "1 while the replica passes its health checks"),
+        ("ejections", "counter", "Times the replica was taken out of rotation"),
+        ("seconds_behind", "gauge", "Age of the newest primary LSN it has replayed"),
+    ):
+        name = f"db_replica_{key}_total" if kind == "counter" else f"db_replica_{key}"
+        samples = [
+            (replica, int(stats[key]) if key == "healthy" else stats[key])
+            for replica, stats in replicas.items()
+            if stats[key] is not None
+        ]
+        lines += _sample_lines(name, help, kind, samples, "replica")
+
+    admission = get_admission_stats()
+    if admission:
+        lines += _sample_lines(
+            "admission_decisions_total",
+            "Requests admitted, rate limited (429) or shed (503)",
+            "counter",
+            [(key, admission[key]) for key in ("admitted", "rate_limited", "shed")],
+            "decision",
+        )
+        for key, help in (
+            ("in_flight", "Requests holding an admission slot"),
+            ("queued", "Requests waiting for an admission slot"),
+            ("clients", "Clients with a rate limit bucket"),
+        ):
+            lines += _sample_lines(
+                f"admission_{key}", help, "gauge", [(None, admission[key])]
+            )
+
+    caches = {"objects": get_cache().get_stats(), "bodies": get_compression_stats()}
+    caches = {cache: stats for cache, stats in caches.items() if stats}
+    for key, kind, help in (
+        ("entries", "gauge", "Cached entries"),
+        ("bytes", "gauge", "Estimated size of the cached entries"),
+        ("hits", "counter", "Cache hits"),
+        ("misses", "counter", "Cache misses"),
+        ("evictions", "counter", "Entries evicted to stay within bounds"),
+    ):
+        name = f"cache_{key}_total" if kind == "counter" else f"cache_{key}"
+        samples = [(cache, stats[key]) for cache, stats in caches.items()]
+        lines += _sample_lines(name, help, kind, samples, "cache")
+
+    statements = get_statement_stats()
+    for key, help in (
+        ("hits", "Executions of an already prepared statement"),
+        ("misses", "Executions without a prepared statement"),
+        ("prepared", "Statements prepared"),
+        ("evictions", "Prepared statements deallocated to stay within bounds"),
+    ):
+        lines += _sample_lines(
+            f"db_prepared_statement_{key}_total",
+            help,
+            "counter",
+            [(None, statements[key])],
+        )
+    return lines
+
+
+def render():
+    """All metrics in the Prometheus text format"""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _stat_lines()
+    return "\n".join(lines) + "\n"
+
+
+class MetricsView:
+    """GET /metrics"""
+
+    def get(self, request):
+        if not METRICS_ENABLED:
+            return 404, {"error": "Not found"}
+        return 200, render().encode("utf-8"), {"Content-Type": CONTENT_TYPE}
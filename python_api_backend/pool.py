@@ -0,0 +1,604 @@
+"""Database connection pooling"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from .db import get_async_db_connection, get_db_connection, get_statement_stats
+from .settings import (
+    DB_POOL_CHECK_INTERVAL,
+    DB_POOL_MAX_IDLE,
+    DB_POOL_MAX_LIFETIME,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the acquire timeout"""
+
+
+class PoolClosed(Exception):
+    """Raised when a connection is requested from a closed pool"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable database connections
+
+    Connections are handed out LIFO so the hottest ones are reused first,
+    validated on checkout when they have been idle for a while, and recycled
+    once they outlive ``max_lifetime``. A background thread closes idle
+    connections above ``min_size`` after ``max_idle`` seconds.
+    """
+
+    def __init__(
+        self,
+        connect=get_db_connection,
+        min_size=1,
+        max_size=10,
+        timeout=30.0,
+        max_lifetime=3600.0,
+        max_idle=600.0,
+        check_interval=30.0,
+        name="default",
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, last_used)
+        self._created_at = {}  # id(conn) -> creation time
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "connection_errors": 0,
+            "checkouts": 0,
+            "checkout_timeouts": 0,
+            "checkout_wait_seconds": 0.0,
+            "health_check_failures": 0,
+            "connections_expired": 0,
+            "connections_reaped": 0,
+        }
+
+        for _ in range(min_size):
+            with self._cond:
+                self._size += 1
+            conn = self._open()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+
+        self._stop_reaper = threading.Event()
+        self._reaper = threading.Thread(
+            target=self._reap_loop, name=f"pool-reaper-{name}", daemon=True
+        )
+        self._reaper.start()
+
+    # -- checkout / checkin -------------------------------------------------
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn, last_used = self._acquire_slot(deadline)
+            if conn is None:
+                # A free slot was reserved for us: open a fresh connection
+                conn = self._open()
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+                self._stats["checkout_wait_seconds"] += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn):
+        """Return a connection to the pool, resetting any open transaction"""
+        if self._closed or conn.closed or self._is_expired(conn):
+            if not self._closed and not conn.closed:
+                with self._cond:
+                    self._stats["connections_expired"] += 1
+            self._discard(conn)
+            return
+
+        try:
+            # A no-op unless the caller left a transaction open; views commit
+            # theirs, since psycopg deallocates every prepared statement of
+            # the connection on ROLLBACK
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context-managed checkout that always returns the connection"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts
+
+        Connections currently checked out are closed when they are returned.
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        self._stop_reaper.set()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def in_use(self):
+        """Connections currently checked out (read without the lock)"""
+        return self._size - len(self._idle)
+
+    def get_stats(self):
+        """Return a snapshot of pool counters and gauges"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                name=self.name,
+                pool_min=self.min_size,
+                pool_max=self.max_size,
+                pool_size=self._size,
+                pool_available=len(self._idle),
+                pool_in_use=self._size - len(self._idle),
+                requests_waiting=self._waiting,
+            )
+        stats["prepared_statements"] = get_statement_stats()
+        return stats
+
+    # -- internals ----------------------------------------------------------
+
+    def _acquire_slot(self, deadline):
+        """Pop an idle connection or reserve room for a new one
+
+        Returns ``(conn, last_used)`` for an idle connection, or
+        ``(None, None)`` when the caller should open a new connection.
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosed(f"Connection pool '{self.name}' is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["checkout_timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No connection available from pool '{self.name}' "
+                        f"within {self.timeout}s ({self._size} in use)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def _open(self):
+        """Open a connection for a slot already counted in ``_size``"""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._stats["connection_errors"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        """Close a connection and release its slot"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            if self._created_at.pop(id(conn), None) is not None:
+                self._size -= 1
+                self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+    def _is_expired(self, conn, now=None):
+        created = self._created_at.get(id(conn))
+        if created is None or not self.max_lifetime:
+            return False
+        return (now or time.monotonic()) - created > self.max_lifetime
+
+    def _is_healthy(self, conn, last_used):
+        """Check a connection that is about to be handed out"""
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if self._is_expired(conn, now):
+            with self._cond:
+                self._stats["connections_expired"] += 1
+            return False
+        if now - last_used < self.check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.commit()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _reap_loop(self):
+        interval = max(1.0, min(self.max_idle or 60.0, self.check_interval) / 2)
+        while not self._stop_reaper.wait(interval):
+            self._reap()
+
+    def _reap(self):
+        """Close idle connections above ``min_size`` or past their lifetime"""
+        now = time.monotonic()
+        victims = []
+        with self._cond:
+            keep = deque()
+            # Oldest idle connections sit at the left end of the deque
+            while self._idle:
+                conn, last_used = self._idle.popleft()
+                surplus = self._size - len(victims) > self.min_size
+                idle_too_long = self.max_idle and now - last_used > self.max_idle
+                if self._is_expired(conn, now) or (surplus and idle_too_long):
+                    victims.append(conn)
+                else:
+                    keep.append((conn, last_used))
+            self._idle = keep
+            self._stats["connections_reaped"] += len(victims)
+        for conn in victims:
+            self._discard(conn)
+
+
+class AsyncConnectionPool:
+    """asyncio counterpart of ConnectionPool for ``async def`` views
+
+    Shares the sizing, lifetime, health check and stats semantics of the
+    threaded pool, but waits on an ``asyncio.Condition`` so a coroutine
+    waiting for a connection never blocks the event loop. The pool is bound
+    to the loop it is first used on.
+    """
+
+    def __init__(
+        self,
+        connect=get_async_db_connection,
+        min_size=1,
+        max_size=10,
+        timeout=30.0,
+        max_lifetime=3600.0,
+        max_idle=600.0,
+        check_interval=30.0,
+        name="async",
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+
+        self._connect = connect
+        self._cond = None
+        self._idle = deque()  # (conn, last_used)
+        self._created_at = {}  # id(conn) -> creation time
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._opened = False
+        self._reaper = None
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "connection_errors": 0,
+            "checkouts": 0,
+            "checkout_timeouts": 0,
+            "checkout_wait_seconds": 0.0,
+            "health_check_failures": 0,
+            "connections_expired": 0,
+            "connections_reaped": 0,
+        }
+
+    async def open(self):
+        """Open ``min_size`` connections and start the idle reaper"""
+        if self._opened:
+            return
+        self._opened = True
+        self._cond = asyncio.Condition()
+        for _ in range(self.min_size):
+            self._size += 1
+            conn = await self._open()
+            self._idle.append((conn, time.monotonic()))
+        self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    async def getconn(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        await self.open()
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn, last_used = await self._acquire_slot(deadline)
+            if conn is None:
+                conn = await self._open()
+            elif not await self._is_healthy(conn, last_used):
+                await self._discard(conn)
+                continue
+
+            self._stats["checkouts"] += 1
+            self._stats["checkout_wait_seconds"] += time.monotonic() - started
+            return conn
+
+    async def putconn(self, conn):
+        """Return a connection to the pool, resetting any open transaction"""
+        if self._closed or conn.closed or self._is_expired(conn):
+            if not self._closed and not conn.closed:
+                self._stats["connections_expired"] += 1
+            await self._discard(conn)
+            return
+
+        try:
+            await conn.rollback()
+        except Exception:
+            await self._discard(conn)
+            return
+
+        async with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """Context-managed checkout that always returns the connection"""
+        conn = await self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            await self.putconn(conn)
+
+    async def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+        idle = list(self._idle)
+        self._idle.clear()
+        if self._cond is not None:
+            async with self._cond:
+                self._cond.notify_all()
+        for conn, _ in idle:
+            await self._discard(conn)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def get_stats(self):
+        """Return a snapshot of pool counters and gauges"""
+        stats = dict(self._stats)
+        stats.update(
+            name=self.name,
+            pool_min=self.min_size,
+            pool_max=self.max_size,
+            pool_size=self._size,
+            pool_available=len(self._idle),
+            pool_in_use=self._size - len(self._idle),
+            requests_waiting=self._waiting,
+        )
+        return stats
+
+    async def _acquire_slot(self, deadline):
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosed(f"Connection pool '{self.name}' is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["checkout_timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No connection available from pool '{self.name}' "
+                        f"within {self.timeout}s ({self._size} in use)"
+                    )
+                self._waiting += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except TimeoutError:
+                    pass
+                finally:
+                    self._waiting -= 1
+
+    async def _open(self):
+        try:
+            conn = await self._connect()
+        except Exception:
+            self._size -= 1
+            self._stats["connection_errors"] += 1
+            async with self._cond:
+                self._cond.notify()
+            raise
+        self._created_at[id(conn)] = time.monotonic()
+        self._stats["connections_created"] += 1
+        return conn
+
+    async def _discard(self, conn):
+        try:
+            await conn.close()
+        except Exception:
+            pass
+        if self._created_at.pop(id(conn), None) is not None:
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+        if self._cond is not None:
+            async with self._cond:
+                self._cond.notify()
+
+    def _is_expired(self, conn, now=None):
+        created = self._created_at.get(id(conn))
+        if created is None or not self.max_lifetime:
+            return False
+        return (now or time.monotonic()) - created > self.max_lifetime
+
+    async def _is_healthy(self, conn, last_used):
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if self._is_expired(conn, now):
+            self._stats["connections_expired"] += 1
+            return False
+        if now - last_used < self.check_interval:
+            return True
+        try:
+            await conn.execute("SELECT 1")
+            await conn.commit()
+            return True
+        except Exception:
+            self._stats["health_check_failures"] += 1
+            return False
+
+    async def _reap_loop(self):
+        interval = max(1.0, min(self.max_idle or 60.0, self.check_interval) / 2)
+        while not self._closed:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            keep, victims = deque(), []
+            while self._idle:
+                conn, last_used = self._idle.popleft()
+                surplus = self._size - len(victims) > self.min_size
+                idle_too_long = self.max_idle and now - last_used > self.max_idle
+                if self._is_expired(conn, now) or (surplus and idle_too_long):
+                    victims.append(conn)
+                else:
+                    keep.append((conn, last_used))
+            self._idle = keep
+            self._stats["connections_reaped"] += len(victims)
+            for conn in victims:
+                await self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_options = {}
+
+
+def configure_pool(**options):
+    """Override settings for the process-wide pool before it is created"""
+    _pool_options.update(options)
+
+
+def _pool_settings():
+    options = {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "timeout": DB_POOL_TIMEOUT,
+        "max_lifetime": DB_POOL_MAX_LIFETIME,
+        "max_idle": DB_POOL_MAX_IDLE,
+        "check_interval": DB_POOL_CHECK_INTERVAL,
+    }
+    options.update(_pool_options)
+    options["min_size"] = min(options["min_size"], options["max_size"])
+    return options
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None or _pool.closed:
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                _pool = ConnectionPool(**_pool_settings())
+    return _pool
+
+
+def close_pool():
+    """Close the process-wide connection pool if it was created"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+_async_pool = None
+
+
+def get_async_pool():
+    """Return the process-wide async pool, creating it on first use
+
+    Must be called from the event loop that will use the pool.
+    """
+    global _async_pool
+    if _async_pool is None or _async_pool.closed:
+        _async_pool = AsyncConnectionPool(**_pool_settings())
+    return _async_pool
+
+
+def get_pool_stats():
+    """Stats of the process-wide pools, keyed by pool name
+
+    Only pools that already exist are reported; this never opens one.
+    """
+    return {
+        pool.name: pool.get_stats()
+        for pool in (_pool, _async_pool)
+        if pool is not None and not pool.closed
+    }
+
+
+async def close_async_pool():
+    """Close the process-wide async pool if it was created"""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
@@ -0,0 +1,269 @@
+"""Minimal HTTP/1.1 message parsing and serialization
+
+Shared by both serving engines. A request head is split into its request
+line and the few headers that frame the message (Content-Length,
+Transfer-Encoding, Connection, Expect), found with one regex scan of the
+raw bytes; the remaining headers are only turned into a dict if a view
+reads them. Response heads are assembled from pre-encoded pieces.
+"""
+
+import json
+import re
+import time
+from collections.abc import Mapping
+from email.utils import formatdate
+from http import HTTPStatus
+
+# Responses that never carry a body (RFC 9110 6.4.1)
+NO_BODY_STATUSES = frozenset((204, 304))
+
+_FRAMING = re.compile(
+    rb"\r\n(content-length|transfer-encoding|connection|expect):[ \t]*([^\r\n]*)",
+    re.IGNORECASE,
+)
+
+
+class HTTPError(Exception):
+    """Raised when a request is malformed or cannot be accepted"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class Headers(Mapping):
+    """Request headers, parsed from the raw head when first read
+
+    Names keep the case they were sent in, as with
+    ``dict(BaseHTTPRequestHandler.headers)``; lines without a colon are
+    skipped.
+    """
+
+    __slots__ = ("_raw", "_items", "_lower")
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._items = None
+        self._lower = None
+
+    def _parse(self):
+        items, lower = {}, {}
+        for line in self._raw.decode("latin-1").split("\r\n"):
+            name, sep, value = line.partition(":")
+            if sep and name and name == name.rstrip():
+                value = value.strip()
+                items[name] = value
+                lower[name.lower()] = value
+        self._items, self._lower = items, lower
+        return items
+
+    @property
+    def _parsed(self):
+        return self._parse() if self._items is None else self._items
+
+    def __getitem__(self, name):
+        return self._parsed[name]
+
+    def __iter__(self):
+        return iter(self._parsed)
+
+    def __len__(self):
+        return len(self._parsed)
+
+    def lookup(self, name):
+        """Case-insensitive get"""
+        if self._lower is None:
+            self._parse()
+        return self._lower.get(name.lower())
+
+    def __repr__(self):
+        return f"Headers({dict(self)!r})"
+
+
+class RequestHead:
+    """Request line and framing of one request"""
+
+    __slots__ = (
+        "method",
+        "target",
+        "version",
+        "headers",
+        "content_length",
+        "chunked",
+        "connection",
+        "expect_continue",
+    )
+
+    def __init__(self, method, target, version, headers, framing):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.chunked = b"transfer-encoding" in framing
+        self.connection = framing.get(b"connection", b"").decode("latin-1")
+        self.expect_continue = framing.get(b"expect", b"").lower() == b"100-continue"
+        length = framing.get(b"content-length", b"0")
+        if not length.isdigit():
+            raise HTTPError(400, "Invalid Content-Length")
+        self.content_length = int(length)
+
+    def check_body(self, max_size):
+        """Reject a body we cannot read before any of it is read"""
+        if self.chunked:
+            raise HTTPError(501, "Chunked request bodies are not supported")
+        if self.content_length > max_size:
+            raise HTTPError(413, "Request body too large")
+
+
+def parse_request_head(head):
+    """Parse a raw request head (without the blank line ending it)"""
+    line_end = head.find(b"\r\n")
+    if line_end < 0:
+        line_end = len(head)
+    request_line = head[:line_end].decode("latin-1")
+    parts = request_line.split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise HTTPError(400, f"Bad request line: {request_line!r}")
+    method, target, version = parts
+
+    framing = {}
+    for name, value in _FRAMING.findall(head):
+        name, value = name.lower(), value.strip()
+        if name == b"content-length" and framing.get(name, value) != value:
+            # Refuse rather than guess which length frames the body
+            raise HTTPError(400, "Conflicting Content-Length headers")
+        framing[name] = value
+    return RequestHead(method, target, version, Headers(head[line_end + 2 :]), framing)
+
+
+def read_request_head(rfile, limit):
+    """Read a request head from a blocking binary file
+
+    Returns the head without its terminating blank line, or None when the
+    client closed the connection between requests. Raises HTTPError with
+    431 as soon as the head grows past ``limit`` bytes.
+    """
+    lines = []
+    size = 0
+    while True:
+        line = rfile.readline(limit - size + 1)
+        if not line:
+            if lines:
+                raise HTTPError(400, "Incomplete request head")
+            return None
+        size += len(line)
+        if size > limit:
+            raise HTTPError(431, "Headers too large")
+        if not line.endswith(b"\r\n"):
+            line = line.rstrip(b"\r\n") + b"\r\n"
+        if line == b"\r\n":
+            if lines:
+                return b"".join(lines)[:-2]
+            continue  # stray empty line before the request line
+        lines.append(line)
+
+
+def get_header(headers, name):
+    """Case-insensitive lookup in a request header dict"""
+    if isinstance(headers, Headers):
+        return headers.lookup(name)
+    value = headers.get(name)
+    if value is not None:
+        return value
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def wants_keep_alive(version, connection_header):
+    """Whether the client asked to keep the connection open"""
+    token = (connection_header or "").lower()
+    if version == "HTTP/1.1":
+        return token != "close"
+    return token == "keep-alive"
+
+
+def reason_phrase(status_code):
+    try:
+        return HTTPStatus(status_code).phrase
+    except ValueError:
+        return ""
+
+
+_status_lines = {}
+_date = (0, b"")  # (second, encoded Date header for it)
+
+_CONTENT_TYPE = b"Content-Type: application/json\r\n"
+_CORS = b"Access-Control-Allow-Origin: *\r\n"
+_CHUNKED = b"Transfer-Encoding: chunked\r\n"
+_CONNECTION = {
+    True: b"Connection: keep-alive\r\n",
+    False: b"Connection: close\r\n",
+}
+
+
+def _status_line(status_code):
+    line = _status_lines.get(status_code)
+    if line is None:
+        line = f"HTTP/1.1 {status_code} {reason_phrase(status_code)}\r\n".encode()
+        _status_lines[status_code] = line
+    return line
+
+
+def _date_header():
+    global _date
+    now = int(time.time())
+    second, header = _date
+    if second != now:
+        header = f"Date: {formatdate(now, usegmt=True)}\r\n".encode()
+        _date = (now, header)
+    return header
+
+
+def render_head(status_code, keep_alive=True, headers=None, content_length=None):
+    """Serialize the status line and headers of a JSON API response
+
+    Without a ``content_length`` the body is sent with chunked encoding.
+    A ``Content-Type`` in ``headers`` replaces the JSON one.
+    """
+    headers = headers or {}
+    parts = [_status_line(status_code), _date_header()]
+    if "Content-Type" not in headers:
+        parts.append(_CONTENT_TYPE)
+    parts.append(_CORS)
+    if status_code not in NO_BODY_STATUSES:
+        if content_length is None:
+            parts.append(_CHUNKED)
+        else:
+            parts.append(b"Content-Length: %d\r\n" % content_length)
+    parts.append(_CONNECTION[bool(keep_alive)])
+    if headers:
+        parts.append(
+            "".join(f"{name}: {value}\r\n" for name, value in headers.items()).encode(
+                "latin-1"
+            )
+        )
+    parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+def render_response(status_code, data, keep_alive=True, headers=None):
+    """Serialize a JSON API response, headers and body, to bytes"""
+    if status_code in NO_BODY_STATUSES:
+        return render_head(status_code, keep_alive, headers)
+    body = json.dumps(data).encode("utf-8")
+    return render_head(status_code, keep_alive, headers, len(body)) + body
+
+
+CONTINUE = b"HTTP/1.1 100 Continue\r\n\r\n"
+
+
+def encode_chunk(chunk):
+    """Frame one piece of a chunked response body"""
+    return b"%x\r\n%b\r\n" % (len(chunk), chunk)
+
+
+LAST_CHUNK = b"0\r\n\r\n"
@@ -0,0 +1,267 @@
+"""Read-replica routing with read-your-writes consistency
+
+With DB_REPLICA_DSNS set, list and retrieve reads check out a connection
+from a replica pool (round-robin or least-loaded) while every write stays on
+the primary pool.
+
+A background thread samples the primary's ``pg_current_wal_lsn()`` and each
+replica's ``pg_last_wal_replay_lsn()`` every DB_REPLICA_CHECK_INTERVAL
+seconds. A replica that has replayed an LSN sampled at time T holds every
+write committed before T, so after a client writes, its reads only go to
+replicas caught up past the moment of that write; for
+DB_READ_YOUR_WRITES_WINDOW seconds, after which any replica will do. When
+no replica qualifies the primary serves the read. A replica that fails a
+check, or a checkout, is ejected until a later check succeeds.
+
+Writes are remembered per process. Under the prefork server a client whose
+write went through one worker can have its next read served by another
+worker that knows nothing of it, and read from a lagging replica: there,
+read-your-writes only holds for requests on the same keep-alive
+connection, or once DB_REPLICA_CHECK_INTERVAL has passed and the replicas
+have caught up. Clients that need it across workers should read from the
+primary for that window.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+
+from .db import get_db_connection
+from .pool import ConnectionPool, _pool_settings, get_pool
+from .settings import (
+    DB_READ_YOUR_WRITES_WINDOW,
+    DB_REPLICA_CHECK_INTERVAL,
+    DB_REPLICA_DSNS,
+    DB_REPLICA_POLICY,
+)
+
+POLICIES = ("round_robin", "least_loaded")
+
+# How many primary LSN samples to keep; a replica lagging further behind
+# than this many check intervals is only used by clients that did not write
+_SAMPLES = 16
+
+
+def parse_lsn(text):
+    """``'16/B374D848'`` -> an int that orders like the WAL position"""
+    high, _, low = text.partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class Replica:
+    """A replica's pool plus what the health checks learnt about it"""
+
+    __slots__ = ("pool", "healthy", "caught_up_at", "replay_lsn", "ejections")
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.healthy = True
+        self.caught_up_at = 0.0  # latest primary sample time it has replayed
+        self.replay_lsn = None
+        self.ejections = 0
+
+
+class ReplicaRouter:
+    """Chooses the pool each read is served from"""
+
+    def __init__(
+        self,
+        primary,
+        replicas,
+        policy=DB_REPLICA_POLICY,
+        window=DB_READ_YOUR_WRITES_WINDOW,
+        check_interval=DB_REPLICA_CHECK_INTERVAL,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"DB_REPLICA_POLICY must be one of {', '.join(POLICIES)}")
+        self.primary = primary
+        self.replicas = [Replica(pool) for pool in replicas]
+        self.policy = policy
+        self.window = window
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._writes = {}  # client -> time of its last write
+        self._last_write = 0.0
+        self._samples = deque(maxlen=_SAMPLES)  # (time, primary LSN)
+        self._next = itertools.count()
+        self._stats = {"primary_reads": 0, "replica_reads": 0}
+
+        self._stop = threading.Event()
+        self._checker = threading.Thread(
+            target=self._check_loop, name="replica-checker", daemon=True
+        )
+        self._checker.start()
+
+    # -- routing ------------------------------------------------------------
+
+    def record_write(self, client):
+        """Note that ``client`` just committed a write on the primary"""
+        now = time.monotonic()
+        with self._lock:
+            self._writes[client] = now
+            self._last_write = now
+
+    def choose(self, client=None):
+        """Pool to serve a read for ``client`` from"""
+        now = time.monotonic()
+        wrote_at = self._writes.get(client)
+        if wrote_at is not None and now - wrote_at > self.window:
+            with self._lock:
+                if self._writes.get(client) == wrote_at:
+                    del self._writes[client]
+            wrote_at = None
+        candidates = [
+            replica
+            for replica in self.replicas
+            if replica.healthy
+            and (wrote_at is None or replica.caught_up_at >= wrote_at)
+        ]
+        with self._lock:
+            self._stats["replica_reads" if candidates else "primary_reads"] += 1
+        if not candidates:
+            return self.primary
+        if self.policy == "least_loaded":
+            return min(candidates, key=lambda replica: replica.pool.in_use).pool
+        return candidates[next(self._next) % len(candidates)].pool
+
+    @contextmanager
+    def connection(self, client=None, timeout=None):
+        """Check out a connection for a read, falling back to the primary"""
+        pool = self.choose(client)
+        try:
+            conn = pool.getconn(timeout)
+        except Exception:
+            if pool is self.primary:
+                raise
+            self._eject(pool)
+            pool = self.primary
+            conn = pool.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn)
+
+    def is_current(self):
+        """Whether every healthy replica holds all writes made through here
+
+        Reads from a lagging replica must not be cached: they could put a
+        version back that a write has already invalidated.
+        """
+        last_write = self._last_write
+        return all(
+            replica.caught_up_at >= last_write
+            for replica in self.replicas
+            if replica.healthy
+        )
+
+    # -- health checks ------------------------------------------------------
+
+    def _eject(self, pool):
+        for replica in self.replicas:
+            if replica.pool is pool and replica.healthy:
+                replica.healthy = False
+                replica.ejections += 1
+
+    def _check_loop(self):
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        """Sample the primary's LSN, then each replica's replay position"""
+        try:
+            self._samples.append((time.monotonic(), self._query_lsn(self.primary)))
+        except Exception:
+            pass  # replicas can still be checked against older samples
+        for replica in self.replicas:
+            try:
+                lsn = self._query_lsn(replica.pool, "pg_last_wal_replay_lsn()")
+            except Exception:
+                if replica.healthy:
+                    replica.healthy = False
+                    replica.ejections += 1
+                continue
+            replica.replay_lsn = lsn
+            replica.caught_up_at = max(
+                (at for at, primary_lsn in self._samples if primary_lsn <= lsn),
+                default=replica.caught_up_at,
+            )
+            replica.healthy = True
+
+    def _query_lsn(self, pool, function="pg_current_wal_lsn()"):
+        with pool.connection(timeout=self.check_interval) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {function}")
+            (lsn,) = cursor.fetchone()
+            conn.commit()
+        if lsn is None:
+            # Not a standby, or not replaying: it cannot serve as a replica
+            raise ValueError("no WAL replay position")
+        return parse_lsn(lsn)
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def close(self):
+        """Stop the checker and close the replica pools"""
+        self._stop.set()
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def get_stats(self):
+        """Per-replica health and pool stats, plus read counts"""
+        now = time.monotonic()
+        return {
+            **self._stats,
+            "replicas": {
+                replica.pool.name: {
+                    **replica.pool.get_stats(),
+                    "healthy": replica.healthy,
+                    "ejections": replica.ejections,
+                    "seconds_behind": (
+                        now - replica.caught_up_at if replica.caught_up_at else None
+                    ),
+                }
+                for replica in self.replicas
+            },
+        }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Return the process-wide router, or None without DB_REPLICA_DSNS"""
+    global _router
+    if _router is None and DB_REPLICA_DSNS:
+        with _router_lock:
+            if _router is None:
+                replicas = []
+                for index, dsn in enumerate(DB_REPLICA_DSNS):
+                    options = _pool_settings()
+                    # A replica that is down at startup must not stop the server
+                    options.update(
+                        connect=partial(get_db_connection, dsn),
+                        min_size=0,
+                        name=f"replica-{index}",
+                    )
+                    replicas.append(ConnectionPool(**options))
+                _router = ReplicaRouter(get_pool(), replicas)
+    return _router
+
+
+def get_replica_stats():
+    """Stats of the router if it was created; this never creates it"""
+    return _router.get_stats() if _router is not None else {}
+
+
+def close_router():
+    """Stop the router and close its replica pools if it was created"""
+    global _router
+    with _router_lock:
+        if _router is not None:
+            _router.close()
+            _router = None
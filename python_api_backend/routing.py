@@ -0,0 +1,183 @@
+"""Compiled URL routing
+
+URL patterns are plain paths whose dynamic segments name a converter,
+e.g. ``/api/vehicles/<int:vehicle_id>``. A trailing slash is optional, as
+with the previous ``/?$`` regexes. Patterns are compiled once: fully static
+paths go into a dict for O(1) lookups, and patterns with parameters into
+a segment trie whose lookup cost depends on path depth, not on how many
+routes there are.
+"""
+
+import inspect
+import re
+
+# name -> (segment regex, converter to the Python value passed to the view)
+CONVERTERS = {
+    "int": (re.compile(r"[0-9]+"), int),
+    "slug": (re.compile(r"[-a-zA-Z0-9_]+"), str),
+    "str": (re.compile(r"[^/]+"), str),
+}
+
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+_PARAMETER = re.compile(r"^<(?:(?P<converter>\w+):)?(?P<name>\w+)>$")
+
+
+class RouteError(Exception):
+    """Raised when a request cannot be routed to a view handler
+
+    ``pattern`` is the matched route's pattern when only the method was
+    wrong.
+    """
+
+    def __init__(self, status_code, data, headers=None, pattern=None):
+        super().__init__(status_code, data)
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+        self.pattern = pattern
+
+
+class Route:
+    """A compiled URL pattern with its view's method -> handler table"""
+
+    __slots__ = ("pattern", "view_class", "param_names", "handlers", "allow")
+
+    def __init__(self, pattern, view_class, param_names):
+        self.pattern = pattern
+        self.view_class = view_class
+        self.param_names = param_names
+        # method -> (handler attribute name, whether it is ``async def``)
+        self.handlers = {}
+        for method in HTTP_METHODS:
+            handler = getattr(view_class, method.lower(), None)
+            if callable(handler):
+                self.handlers[method] = (
+                    method.lower(),
+                    inspect.iscoroutinefunction(handler),
+                )
+        self.allow = ", ".join(self.handlers)
+
+    def __repr__(self):
+        return f"<Route {self.pattern} -> {self.view_class.__name__}>"
+
+
+class _Node:
+    __slots__ = ("static", "dynamic", "route")
+
+    def __init__(self):
+        self.static = {}  # segment -> _Node
+        self.dynamic = []  # (converter name, regex, to_python, _Node)
+        self.route = None
+
+
+def _split(path):
+    path = path.strip("/")
+    return path.split("/") if path else []
+
+
+class Router:
+    """Resolve request paths to compiled routes"""
+
+    def __init__(self, patterns=()):
+        self.routes = []
+        self._static = {}
+        self._root = _Node()
+        for pattern, view_class in patterns:
+            self.add(pattern, view_class)
+
+    def add(self, pattern, view_class):
+        """Compile a pattern and register it; earlier patterns win ties"""
+        node = self._root
+        param_names = []
+        for segment in _split(pattern):
+            parameter = _PARAMETER.match(segment)
+            if parameter is None:
+                node = node.static.setdefault(segment, _Node())
+                continue
+
+            converter = parameter.group("converter") or "str"
+            if converter not in CONVERTERS:
+                raise ValueError(f"Unknown path converter {converter!r} in {pattern}")
+            param_names.append(parameter.group("name"))
+            for name, _, _, child in node.dynamic:
+                if name == converter:
+                    node = child
+                    break
+            else:
+                regex, to_python = CONVERTERS[converter]
+                child = _Node()
+                node.dynamic.append((converter, regex, to_python, child))
+                node = child
+
+        route = Route(pattern, view_class, tuple(param_names))
+        self.routes.append(route)
+        if node.route is None:
+            node.route = route
+        if not param_names:
+            self._static.setdefault("/" + "/".join(_split(pattern)), route)
+        return route
+
+    def lookup(self, path):
+        """Find the route for a path; returns ``(route, params)`` or ``(None, None)``"""
+        path = path.partition("?")[0]
+        if len(path) > 1 and path[-1] == "/":
+            path = path[:-1]
+
+        route = self._static.get(path)
+        if route is not None:
+            return route, ()
+
+        if not path.startswith("/"):
+            return None, None
+        params = []
+        route = self._walk(self._root, path[1:].split("/"), 0, params)
+        if route is None:
+            return None, None
+        return route, tuple(params)
+
+    def resolve(self, path):
+        """Match path to a view class and extract parameters"""
+        route, params = self.lookup(path)
+        if route is None:
+            return None, None
+        return route.view_class, params
+
+    def match(self, method, path):
+        """Resolve a request to ``(route, handler name, is_async, params)``
+
+        Raises RouteError with 404 for unknown paths and 405 (with an
+        ``Allow`` header) when the view does not handle ``method``.
+        """
+        route, params = self.lookup(path)
+        if route is None:
+            raise RouteError(404, {"error": "Not found"})
+        handler = route.handlers.get(method)
+        if handler is None:
+            raise RouteError(
+                405,
+                {"error": f"Method {method} not allowed"},
+                {"Allow": route.allow},
+                pattern=route.pattern,
+            )
+        return route, handler[0], handler[1], params
+
+    def _walk(self, node, segments, index, params):
+        if index == len(segments):
+            return node.route
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            route = self._walk(child, segments, index + 1, params)
+            if route is not None:
+                return route
+
+        for _, regex, to_python, child in node.dynamic:
+            if regex.fullmatch(segment):
+                params.append(to_python(segment))
+                route = self._walk(child, segments, index + 1, params)
+                if route is not None:
+                    return route
+                params.pop()
+        return None
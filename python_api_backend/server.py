@@ -1,108 +1,285 @@
-import json
 import os
+import select
+import signal
 import sys
-import traceback
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import time
+from socketserver import StreamRequestHandler
 
+from base.streaming import StreamingResponse
+from python_api_backend.access_log import access_log
+from python_api_backend.admission import (
+    AdmissionRejected,
+    get_admission,
+    thread_pool_admission,
+)
+from python_api_backend.compression import encode_body, encode_stream
+from python_api_backend.deadlines import request_deadline
+from python_api_backend.dispatch import dispatch, log_exception
+from python_api_backend.metrics import RequestTimer, in_flight, record_request
+from python_api_backend.pool import close_pool
+from python_api_backend.protocol import (
+    CONTINUE,
+    LAST_CHUNK,
+    NO_BODY_STATUSES,
+    HTTPError,
+    encode_chunk,
+    parse_request_head,
+    read_request_head,
+    render_head,
+    render_response,
+    wants_keep_alive,
+)
+from python_api_backend.replicas import close_router
+from python_api_backend.settings import (
+    DB_MAX_CONNECTIONS,
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_KEEPALIVE_TIMEOUT,
+    SERVER_MAX_BODY_SIZE,
+    SERVER_MAX_HEADER_SIZE,
+    SERVER_MAX_KEEPALIVE_REQUESTS,
+    SERVER_MODE,
+    SERVER_REUSE_PORT,
+    SERVER_THREADS,
+    SERVER_WORKERS,
+)
 from python_api_backend.urls import URLRouter
+from python_api_backend.workers import (
+    HTTPServer,
+    PreforkServer,
+    ThreadPoolHTTPServer,
+)
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
-class APIHandler(BaseHTTPRequestHandler):
-    """HTTP request handler for the API"""
+class APIHandler(StreamRequestHandler):
+    """HTTP request handler for the API
+
+    Speaks HTTP/1.1 with persistent connections: every response is framed
+    with Content-Length (or chunked encoding), so clients can reuse the
+    socket and pipeline requests. Idle connections are dropped after
+    SERVER_KEEPALIVE_TIMEOUT and each connection serves at most
+    SERVER_MAX_KEEPALIVE_REQUESTS requests. A connection holds its worker
+    thread while idle, so under the thread pool it is closed as soon as
+    other connections are queued for a thread instead.
+
+    Requests are parsed by protocol.py rather than http.server: header
+    heads over SERVER_MAX_HEADER_SIZE are refused with 431 while they are
+    still being read, and bodies over SERVER_MAX_BODY_SIZE with 413 before
+    any of the body is read.
+    """
+
+    timeout = SERVER_KEEPALIVE_TIMEOUT
+    disable_nagle_algorithm = True
+    max_keepalive_requests = SERVER_MAX_KEEPALIVE_REQUESTS
+    max_header_size = SERVER_MAX_HEADER_SIZE
+    max_body_size = SERVER_MAX_BODY_SIZE
 
     router = URLRouter()
 
-    def _dispatch(self, method):
+    def handle(self):
+        """Serve requests on the connection until either side closes it"""
+        self.client = self.client_address[0]
+        served = 1
+        try:
+            while self.handle_one_request(served):
+                served += 1
+                if not self.wait_for_request():
+                    break
+        except (ConnectionError, TimeoutError):
+            pass
+
+    def server_has_waiting(self):
+        """Whether other connections are waiting for a worker thread"""
+        has_waiting = getattr(self.server, "has_waiting", None)
+        return has_waiting is not None and has_waiting()
+
+    def wait_for_request(self):
+        """Wait for the next request on a kept-alive connection
+
+        Returns False when the connection should be closed instead: the
+        client stayed idle for the keep-alive timeout, or connections are
+        queued for the worker thread this one is holding.
+        """
+        sock = self.connection
+        # A pipelined request may already be buffered; peek without blocking
+        sock.setblocking(False)
+        try:
+            if self.rfile.peek(1):
+                return True
+        finally:
+            sock.settimeout(self.timeout)
+        # The server's waiting_fd turns readable when connections queue up
+        waiting_fd = getattr(self.server, "waiting_fd", None)
+        watched = [sock] if waiting_fd is None else [sock, waiting_fd]
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select(watched, [], [], remaining)
+            if sock in readable:
+                return True
+            if readable and self.server_has_waiting():
+                return False
+
+    def handle_one_request(self, served):
+        """Read, dispatch and answer one request; return whether to continue"""
+        try:
+            head = read_request_head(self.rfile, self.max_header_size)
+            if head is None:
+                return False
+            request = parse_request_head(head)
+            request.check_body(self.max_body_size)
+        except HTTPError as exc:
+            # The rest of the request is unread: answer and close
+            access_log.message(self.client, exc.message)
+            self.wfile.write(
+                render_response(exc.status_code, {"error": exc.message}, False)
+            )
+            return False
+
+        raw_body = None
+        if request.content_length:
+            if request.expect_continue:
+                self.wfile.write(CONTINUE)
+            raw_body = self.rfile.read(request.content_length)
+            if len(raw_body) < request.content_length:
+                return False
+        keep_alive = (
+            wants_keep_alive(request.version, request.connection)
+            and served < self.max_keepalive_requests
+            and not self.server_has_waiting()
+        )
+        return self._dispatch(request, raw_body, keep_alive)
+
+    def _dispatch(self, request, raw_body, keep_alive):
         """Dispatch request to appropriate view method"""
+        self.timer = RequestTimer()
+        deadline = request_deadline(
+            request.headers, self.timer.started, self.client_gone
+        )
+        in_flight.inc()
+        status_code = 500
+        release = None
         try:
-            # Read request body if present
-            content_length = int(self.headers.get("Content-Length", 0))
-            body_str = (
-                self.rfile.read(content_length).decode("utf-8")
-                if content_length
-                else None
+            try:
+                release = get_admission().admit(
+                    self.client, request.method, request.target, request.headers
+                )
+            except AdmissionRejected as exc:
+                status_code = exc.status_code
+                return self._send_response(
+                    request, status_code, exc.data, exc.headers, keep_alive
+                )
+            status_code, response_data, headers = dispatch(
+                self.router,
+                request.method,
+                request.target,
+                request.headers,
+                raw_body,
+                self.timer,
+                self.client,
+                deadline,
             )
-            body = json.loads(body_str) if body_str else None
-
-            # Prepare request object
-            request = {
-                "method": method,
-                "path": self.path,
-                "headers": dict(self.headers),
-                "body": body,
-            }
-
-            # Resolve URL to view class
-            view_class, params = self.router.resolve(self.path)
-
-            if view_class is None:
-                self._send_response(404, {"error": "Not found"})
-                return
-
-            # Instantiate view and call method
-            view = view_class()
-            method_name = method.lower()
-
-            if not hasattr(view, method_name):
-                self._send_response(405, {"error": f"Method {method} not allowed"})
-                return
-
-            handler = getattr(view, method_name)
-
-            # Call handler with request and any URL parameters
-            if params:
-                # Convert string params to integers if they're numeric
-                params = tuple(int(p) if p.isdigit() else p for p in params)
-                status_code, response_data = handler(request, *params)
-            else:
-                status_code, response_data = handler(request)
-
-            self._send_response(status_code, response_data)
-
-        except json.JSONDecodeError:
-            self._send_response(400, {"error": "Invalid JSON"})
-        except Exception as e:
-            print("Error", str(e))
-            traceback.print_exc()
-            self._send_response(500, {"error": str(e)})
-
-    def do_GET(self):
-        """Handle GET requests"""
-        self._dispatch("GET")
-
-    def do_POST(self):
-        """Handle POST requests"""
-        self._dispatch("POST")
-
-    def do_PUT(self):
-        """Handle PUT requests"""
-        self._dispatch("PUT")
-
-    def do_DELETE(self):
-        """Handle DELETE requests"""
-        self._dispatch("DELETE")
-
-    def _send_response(self, status_code, data):
-        """Send JSON response"""
-        self.send_response(status_code)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode("utf-8"))
-
-    def log_message(self, format, *args):
-        """Custom logging"""
-        print(f"{self.address_string()} - {format % args}")
-
-
-def run_server(host="localhost", port=8000):
-    """Start the HTTP server"""
-    server_address = (host, port)
-    httpd = HTTPServer(server_address, APIHandler)
-    print(f"Server running on http://{host}:{port}")
+            return self._send_response(
+                request, status_code, response_data, headers, keep_alive
+            )
+        finally:
+            if release is not None:
+                release()
+            in_flight.dec()
+            record_request(self.timer, request.method, status_code)
+            access_log.request(
+                self.client,
+                request.method,
+                request.target,
+                request.version,
+                status_code,
+                self.timer.elapsed(),
+            )
+
+    def client_gone(self):
+        """Whether the connection to the client is broken; safe from any thread
+
+        End of input is not enough: a client may shut down its side after
+        sending the request and still read the response. Only an error or a
+        hang-up, as after a reset, counts.
+        """
+        poller = select.poll()
+        try:
+            poller.register(self.connection, select.POLLERR | select.POLLHUP)
+            return bool(poller.poll(0))
+        except (OSError, ValueError):
+            return True
+
+    def _send_response(self, request, status_code, data, headers, keep_alive):
+        """Send JSON response, compressed if the client accepts it
+
+        Returns whether the connection can be kept open.
+        """
+        start = time.perf_counter()
+        if isinstance(data, StreamingResponse):
+            data, headers = encode_stream(data, request.headers, headers)
+            start = self.timer.mark("serialize", start)
+            keep_alive = self._send_chunked_response(
+                status_code, data, headers, keep_alive
+            )
+            self.timer.mark("write", start)
+            return keep_alive
+        if status_code in NO_BODY_STATUSES:
+            self.wfile.write(render_head(status_code, keep_alive, headers))
+            self.timer.mark("write", start)
+            return keep_alive
+        body, headers = encode_body(data, request.headers, headers, request.target)
+        start = self.timer.mark("serialize", start)
+        # One write (and one packet for small responses) for head and body
+        self.wfile.write(
+            render_head(status_code, keep_alive, headers, len(body)) + body
+        )
+        self.timer.mark("write", start)
+        return keep_alive
+
+    def _send_chunked_response(self, status_code, chunks, headers, keep_alive):
+        """Send a JSON response of unknown length using chunked encoding"""
+        # Headers go out before the first row is fetched
+        self.wfile.write(render_head(status_code, keep_alive, headers))
+        try:
+            for chunk in chunks:
+                if chunk:
+                    self.wfile.write(encode_chunk(chunk))
+        except Exception as exc:
+            # The status line is already sent: drop the connection without
+            # the terminating chunk so the client sees a truncated body
+            log_exception(exc)
+            return False
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+        self.wfile.write(LAST_CHUNK)
+        return keep_alive
+
+
+def run_server(host="localhost", port=8000, mode=None, workers=None, threads=None):
+    """Start the HTTP server
+
+    ``mode`` is one of ``single`` (one request at a time), ``thread``
+    (bounded thread pool), ``prefork`` (worker processes, each with its
+    own thread pool) or ``asyncio`` (event loop with async views and an
+    executor for sync views). Unset arguments fall back to the SERVER_*
+    settings.
+    """
+    mode = mode or SERVER_MODE
+    threads = threads or SERVER_THREADS
+    workers = workers or SERVER_WORKERS
+
+    if mode not in ("single", "thread", "prefork", "asyncio"):
+        raise ValueError(f"Unknown server mode: {mode}")
+
+    print(f"Server running on http://{host}:{port} ({mode} mode)")
     print("\nAvailable endpoints:")
     print("  GET    /api/vehicles       - List all vehicles")
     print("  POST   /api/vehicles       - Create vehicle")
@@ -114,7 +291,56 @@ def run_server(host="localhost", port=8000):
     print("  GET    /api/users/{id}     - Get user")
     print("  PUT    /api/users/{id}     - Update user")
     print("  DELETE /api/users/{id}     - Delete user")
-    httpd.serve_forever()
+    print("  GET    /metrics            - Prometheus metrics")
+
+    if mode == "asyncio":
+        # Imported here so the other modes never load the asyncio engine
+        from python_api_backend.aio_server import run_async_server
+
+        run_async_server(host, port, threads=threads)
+        return
+
+    if mode == "prefork":
+        PreforkServer(
+            host,
+            port,
+            APIHandler,
+            workers=workers,
+            threads=threads,
+            reuse_port=SERVER_REUSE_PORT,
+            graceful_timeout=SERVER_GRACEFUL_TIMEOUT,
+            db_connection_budget=DB_MAX_CONNECTIONS,
+        ).serve_forever()
+        return
+
+    server_address = (host, port)
+    if mode == "thread":
+        queue_size, queue_timeout = thread_pool_admission(threads)
+        httpd = ThreadPoolHTTPServer(
+            server_address,
+            APIHandler,
+            threads=threads,
+            queue_size=queue_size,
+            queue_timeout=queue_timeout,
+        )
+    else:
+        httpd = HTTPServer(server_address, APIHandler)
+
+    def stop(signum, frame):
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if mode == "thread":
+            httpd.drain(timeout=SERVER_GRACEFUL_TIMEOUT)
+        httpd.server_close()
+        close_router()
+        close_pool()
+        access_log.flush()
 
 
 if __name__ == "__main__":
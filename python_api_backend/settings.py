@@ -1,4 +1,7 @@
-from decouple import config
+import os
+
+from decouple import Csv, config
+
 # PostgreSQL Database configuration
 
 # DATABASE_CONFIG = {
@@ -16,6 +19,89 @@ DB_HOST = config('DB_HOST',"localhost")
 DB_PORT = config('DB_PORT',5434)
 DB_NAME = config("DB_NAME","python_api_db")
 
+# Read replicas. DSNs are libpq strings or postgresql:// URIs; an empty
+# DB_PRIMARY_DSN means the DB_* settings above. List and retrieve reads go to
+# the replicas, everything else to the primary.
+DB_PRIMARY_DSN = config("DB_PRIMARY_DSN", "")
+DB_REPLICA_DSNS = config("DB_REPLICA_DSNS", "", cast=Csv())  # comma-separated
+DB_REPLICA_POLICY = config("DB_REPLICA_POLICY", "round_robin")  # round_robin or least_loaded
+DB_REPLICA_CHECK_INTERVAL = config("DB_REPLICA_CHECK_INTERVAL", 2.0, cast=float)  # seconds between LSN/health checks
+DB_READ_YOUR_WRITES_WINDOW = config("DB_READ_YOUR_WRITES_WINDOW", 10.0, cast=float)  # seconds a writer's reads stay on caught-up nodes
+
+# Connection pool configuration
+DB_POOL_MIN_SIZE = config("DB_POOL_MIN_SIZE", 1, cast=int)
+DB_POOL_MAX_SIZE = config("DB_POOL_MAX_SIZE", 10, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", 30.0, cast=float)  # seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = config("DB_POOL_MAX_LIFETIME", 3600.0, cast=float)
+DB_POOL_MAX_IDLE = config("DB_POOL_MAX_IDLE", 600.0, cast=float)
+DB_POOL_CHECK_INTERVAL = config("DB_POOL_CHECK_INTERVAL", 30.0, cast=float)  # ping connections idle longer than this
+
+# Total connections all prefork workers may hold; split evenly, 0 = DB_POOL_MAX_SIZE each
+DB_MAX_CONNECTIONS = config("DB_MAX_CONNECTIONS", 0, cast=int)
+
+# Server-side prepared statements: prepare a query after this many runs on a
+# connection (-1 disables), keeping at most DB_PREPARED_MAX per connection
+DB_PREPARE_THRESHOLD = config("DB_PREPARE_THRESHOLD", 5, cast=int)
+DB_PREPARED_MAX = config("DB_PREPARED_MAX", 100, cast=int)
+
+# List endpoint page sizes
+API_DEFAULT_PAGE_SIZE = config("API_DEFAULT_PAGE_SIZE", 50, cast=int)
+API_MAX_PAGE_SIZE = config("API_MAX_PAGE_SIZE", 500, cast=int)
+# Most items one bulk create/update request may carry
+API_MAX_BULK_ITEMS = config("API_MAX_BULK_ITEMS", 5000, cast=int)
+
+# Read-through cache for retrieve endpoints: "memory" or "none"
+CACHE_BACKEND = config("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = config("CACHE_MAX_ENTRIES", 10000, cast=int)
+CACHE_MAX_BYTES = config("CACHE_MAX_BYTES", 64 * 1024 * 1024, cast=int)
+CACHE_TTL = config("CACHE_TTL", 30.0, cast=float)  # seconds
+
+# Response compression (gzip/deflate, brotli when installed)
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", True, cast=bool)
+COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", 1024, cast=int)  # bytes
+COMPRESSION_LEVEL = config("COMPRESSION_LEVEL", 6, cast=int)  # zlib 1-9
+COMPRESSION_BROTLI_QUALITY = config("COMPRESSION_BROTLI_QUALITY", 4, cast=int)  # 0-11
+COMPRESSION_CACHE_MAX_BYTES = config("COMPRESSION_CACHE_MAX_BYTES", 16 * 1024 * 1024, cast=int)
+
+# Prometheus metrics on /metrics
+METRICS_ENABLED = config("METRICS_ENABLED", True, cast=bool)
+
+# Access log: lines are buffered and written by a background thread
+ACCESS_LOG_ENABLED = config("ACCESS_LOG_ENABLED", True, cast=bool)
+ACCESS_LOG_SAMPLE_RATE = config("ACCESS_LOG_SAMPLE_RATE", 1.0, cast=float)  # 0-1; 5xx are always logged
+ACCESS_LOG_BUFFER_SIZE = config("ACCESS_LOG_BUFFER_SIZE", 10000, cast=int)  # lines; more are dropped
+ACCESS_LOG_FLUSH_INTERVAL = config("ACCESS_LOG_FLUSH_INTERVAL", 0.5, cast=float)  # seconds
+
+# Group commit: concurrent single-row creates/updates share one transaction
+WRITE_COALESCE_ENABLED = config("WRITE_COALESCE_ENABLED", False, cast=bool)
+WRITE_COALESCE_WINDOW = config("WRITE_COALESCE_WINDOW", 0.002, cast=float)  # seconds the first write waits
+WRITE_COALESCE_MAX_ITEMS = config("WRITE_COALESCE_MAX_ITEMS", 64, cast=int)  # writes per transaction
+
+# Admission control in front of dispatch (per process)
+ADMISSION_RATE = config("ADMISSION_RATE", 0.0, cast=float)  # requests/s per client, 0 = no rate limit
+ADMISSION_BURST = config("ADMISSION_BURST", 50, cast=int)  # requests a client may send at once
+ADMISSION_CLIENT_HEADER = config("ADMISSION_CLIENT_HEADER", "X-API-Key")  # client key; the address without it
+ADMISSION_MAX_CLIENTS = config("ADMISSION_MAX_CLIENTS", 100000, cast=int)  # token buckets kept
+ADMISSION_MAX_IN_FLIGHT = config("ADMISSION_MAX_IN_FLIGHT", 64, cast=int)  # 0 = unbounded
+ADMISSION_MAX_QUEUE = config("ADMISSION_MAX_QUEUE", 128, cast=int)  # requests waiting for a slot
+ADMISSION_QUEUE_TIMEOUT = config("ADMISSION_QUEUE_TIMEOUT", 1.0, cast=float)  # seconds before a 503
+ADMISSION_PRIORITY = config("ADMISSION_PRIORITY", "none")  # none, reads or writes: who is let in first
+ADMISSION_EXEMPT_PATHS = config("ADMISSION_EXEMPT_PATHS", "/metrics", cast=Csv())
+
+# Request deadlines, applied as statement_timeout/lock_timeout and enforced by
+# cancelling queries; X-Request-Timeout may shorten them
+REQUEST_TIMEOUT = config("REQUEST_TIMEOUT", 30.0, cast=float)  # seconds, 0 = none
+REQUEST_ROUTE_TIMEOUTS = config("REQUEST_ROUTE_TIMEOUTS", "", cast=Csv())  # e.g. /api/vehicles/bulk=120
+
 # Server configuration
 HOST = 'localhost'
-PORT = 8000
\ No newline at end of file
+PORT = 8000
+SERVER_MODE = config("SERVER_MODE", "thread")  # single, thread, prefork or asyncio
+SERVER_THREADS = config("SERVER_THREADS", 16, cast=int)  # per process
+SERVER_WORKERS = config("SERVER_WORKERS", os.cpu_count() or 1, cast=int)  # prefork processes
+SERVER_REUSE_PORT = config("SERVER_REUSE_PORT", False, cast=bool)
+SERVER_GRACEFUL_TIMEOUT = config("SERVER_GRACEFUL_TIMEOUT", 30.0, cast=float)
+SERVER_KEEPALIVE_TIMEOUT = config("SERVER_KEEPALIVE_TIMEOUT", 5.0, cast=float)  # idle seconds
+SERVER_MAX_KEEPALIVE_REQUESTS = config("SERVER_MAX_KEEPALIVE_REQUESTS", 1000, cast=int)
+SERVER_MAX_HEADER_SIZE = config("SERVER_MAX_HEADER_SIZE", 64 * 1024, cast=int)
+SERVER_MAX_BODY_SIZE = config("SERVER_MAX_BODY_SIZE", 10 * 1024 * 1024, cast=int)
@@ -1,46 +1,48 @@
 """URL routing configuration"""
 
-import re
-
 from core.views import (
+    UserBulkApiView,
     UserCreateApiView,
     UserListApiView,
     UserRetrieveApiView,
     UserUpdateApiView,
+    VehicleBulkApiView,
     VehicleCreateApiView,
     VehicleListApiView,
     VehicleRetrieveApiView,
     VehicleUpdateApiView,
 )
+from python_api_backend.metrics import MetricsView
+from python_api_backend.routing import Router
 
-# URL patterns mapping
+# URL patterns mapping, compiled once by URLRouter (see routing.py)
 urlpatterns = [
     # Vehicle URLs
-    (r"^/api/vehicles/?$", VehicleListApiView),  # GET - list vehicles
-    (r"^/api/vehicles/create/?$", VehicleCreateApiView),  # POST - create vehicle
+    ("/api/vehicles", VehicleListApiView),  # GET - list vehicles
+    ("/api/vehicles/create", VehicleCreateApiView),  # POST - create vehicle
+    ("/api/vehicles/bulk", VehicleBulkApiView),  # POST - create, PUT - update many
     (
-        r"^/api/vehicles/(\d+)/?$",
+        "/api/vehicles/<int:vehicle_id>",
         VehicleRetrieveApiView,
     ),  # GET - retrieve single vehicle
-    (r"^/api/vehicles/(\d+)/update/?$", VehicleUpdateApiView),  # PUT - update vehicle
+    (
+        "/api/vehicles/<int:vehicle_id>/update",
+        VehicleUpdateApiView,
+    ),  # PUT - update vehicle
     # User URLs
-    (r"^/api/users/?$", UserListApiView),  # GET - list users
-    (r"^/api/users/create/?$", UserCreateApiView),  # POST - create user
-    (r"^/api/users/(\d+)/?$", UserRetrieveApiView),  # GET - retrieve single user
-    (r"^/api/users/(\d+)/update/?$", UserUpdateApiView),  # PUT - update user
+    ("/api/users", UserListApiView),  # GET - list users
+    ("/api/users/create", UserCreateApiView),  # POST - create user
+    ("/api/users/bulk", UserBulkApiView),  # POST - create, PUT - update many
+    ("/api/users/<int:user_id>", UserRetrieveApiView),  # GET - retrieve single user
+    ("/api/users/<int:user_id>/update", UserUpdateApiView),  # PUT - update user
+    # Monitoring
+    ("/metrics", MetricsView),  # GET - Prometheus metrics
 ]
 
 
-class URLRouter:
+class URLRouter(Router):
     """Router to match URLs to view classes"""
 
-    def __init__(self):
-        self.urlpatterns = urlpatterns
-
-    def resolve(self, path):
-        """Match path to a view class and extract parameters"""
-        for pattern, view_class in self.urlpatterns:
-            match = re.match(pattern, path)
-            if match:
-                return view_class, match.groups()
-        return None, None
+    def __init__(self, patterns=None):
+        self.urlpatterns = urlpatterns if patterns is None else patterns
+        super().__init__(self.urlpatterns)
@@ -0,0 +1,340 @@
+"""Concurrent serving models: bounded thread pool and pre-forked workers"""
+
+import math
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from python_api_backend import admission, pool, replicas
+from python_api_backend.access_log import access_log
+from python_api_backend.protocol import render_response
+
+
+class HTTPServer(socketserver.TCPServer):
+    """Stand-in for ``http.server.HTTPServer``
+
+    Importing http.server also loads http.client and html, which nothing
+    here uses; every worker would carry them.
+    """
+
+    allow_reuse_address = True
+
+    def server_bind(self):
+        super().server_bind()
+        host, port = self.server_address[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands accepted connections to a fixed set of threads
+
+    The hand-off queue is bounded, so once every thread is busy and the
+    queue is full the accept loop blocks and new clients wait in the
+    kernel backlog instead of piling up in memory. With a ``queue_timeout``
+    connections are shed with a 503 instead: straight away when the queue
+    is full, or when a thread picks them up after they waited longer than
+    that. Idle keep-alive connections give their thread up to connections
+    waiting in the queue: ``waiting_fd`` is readable exactly while
+    ``has_waiting`` holds, so handlers can wait on it next to their socket.
+    """
+
+    def __init__(
+        self,
+        server_address,
+        RequestHandlerClass,
+        threads=16,
+        queue_size=None,
+        sock=None,
+        queue_timeout=None,
+    ):
+        self.threads = threads
+        self.queue_timeout = queue_timeout
+        self._requests = queue.Queue(maxsize=queue_size or threads * 4)
+        self._workers = []
+        self._free_workers = 0  # threads waiting for a connection
+        self._free_lock = threading.Lock()
+        self.waiting_fd, self._waiting_w = os.pipe()
+        self._signalled = False  # whether the pipe holds its byte
+        if sock is None:
+            super().__init__(server_address, RequestHandlerClass)
+        else:
+            # Serve on an already bound and listening (inherited) socket
+            super().__init__(
+                server_address, RequestHandlerClass, bind_and_activate=False
+            )
+            self.socket.close()
+            self.socket = sock
+            self.server_address = sock.getsockname()
+            host, port = self.server_address[:2]
+            self.server_name = socket.getfqdn(host)
+            self.server_port = port
+
+        for i in range(threads):
+            worker = threading.Thread(
+                target=self._work, name=f"http-worker-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def process_request(self, request, client_address):
+        """Queue the connection for a worker thread"""
+        item = (request, client_address, time.monotonic())
+        if self.queue_timeout is None:
+            self._requests.put(item)
+        else:
+            try:
+                self._requests.put_nowait(item)
+            except queue.Full:
+                self.shed(request, client_address, "Server busy")
+                self.shutdown_request(request)
+                return
+        with self._free_lock:
+            self._signal_waiting()
+
+    def shed(self, request, client_address, message):
+        """Answer a connection with a 503 without spending a thread on it"""
+        admission.get_admission().record_shed()
+        access_log.message(client_address[0], message)
+        retry_after = str(max(1, math.ceil(self.queue_timeout)))
+        response = render_response(
+            503, {"error": message}, False, {"Retry-After": retry_after}
+        )
+        try:
+            request.setblocking(False)
+            # Read what already arrived of the request so that closing the
+            # socket does not reset the connection before the 503 is read
+            request.recv(65536)
+        except OSError:
+            pass
+        try:
+            request.sendall(response)
+        except OSError:
+            pass
+
+    def has_waiting(self):
+        """Whether accepted connections wait and no worker thread is free"""
+        return self._requests.qsize() > self._free_workers
+
+    def _signal_waiting(self):
+        # Called under _free_lock after every change that can flip
+        # has_waiting(): a queued connection, or a thread becoming free
+        waiting = self.has_waiting()
+        if waiting and not self._signalled:
+            os.write(self._waiting_w, b"\0")
+        elif self._signalled and not waiting:
+            os.read(self.waiting_fd, 1)
+        self._signalled = waiting
+
+    def _work(self):
+        while True:
+            with self._free_lock:
+                self._free_workers += 1
+                self._signal_waiting()
+            item = self._requests.get()
+            with self._free_lock:
+                self._free_workers -= 1
+            if item is None:
+                return
+            request, client_address, queued_at = item
+            try:
+                if (
+                    self.queue_timeout is not None
+                    and time.monotonic() - queued_at > self.queue_timeout
+                ):
+                    self.shed(
+                        request, client_address, "Server busy, timed out in queue"
+                    )
+                else:
+                    self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        os.close(self.waiting_fd)
+        os.close(self._waiting_w)
+
+    def drain(self, timeout=None):
+        """Let worker threads finish queued and in-flight requests, then stop"""
+        for _ in self._workers:
+            self._requests.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            worker.join(remaining if remaining is None else max(0, remaining))
+
+
+def create_listen_socket(host, port, reuse_port=False, backlog=1024):
+    """Create a bound, listening TCP socket"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+class PreforkServer:
+    """Master process that runs N worker processes on one listening port
+
+    By default the master binds the socket once and every worker inherits
+    it. With ``reuse_port`` each worker binds its own SO_REUSEPORT socket
+    and the kernel balances new connections between them. Workers that
+    exit unexpectedly are respawned; SIGTERM/SIGINT stop the workers
+    gracefully, letting in-flight requests finish within ``graceful_timeout``.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        handler_class,
+        workers=None,
+        threads=16,
+        reuse_port=False,
+        graceful_timeout=30.0,
+        db_connection_budget=0,
+    ):
+        self.host = host
+        self.port = port
+        self.handler_class = handler_class
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.db_connection_budget = db_connection_budget
+        self.socket = None
+        self._children = {}  # pid -> worker number
+        self._stopping = False
+
+    def worker_pool_size(self):
+        """Connections each worker's pool may open within the total budget"""
+        if not self.db_connection_budget:
+            return None
+        return max(1, self.db_connection_budget // self.workers)
+
+    # -- master -------------------------------------------------------------
+
+    def serve_forever(self):
+        if not self.reuse_port:
+            self.socket = create_listen_socket(self.host, self.port)
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for number in range(self.workers):
+            self._spawn(number)
+
+        try:
+            while not self._stopping:
+                self._reap_children(respawn=True)
+                time.sleep(0.2)
+        finally:
+            self._stop_children()
+            if self.socket is not None:
+                self.socket.close()
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _spawn(self, number):
+        # Unflushed output would otherwise be written by both processes
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._run_worker(number)
+            finally:
+                access_log.flush()
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self._children[pid] = number
+        return pid
+
+    def _reap_children(self, respawn):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if pid == 0:
+                return
+            number = self._children.pop(pid, None)
+            if number is None:
+                continue
+            if respawn and not self._stopping:
+                print(
+                    f"Worker {number} (pid {pid}) exited with status "
+                    f"{os.waitstatus_to_exitcode(status)}, respawning"
+                )
+                self._spawn(number)
+
+    def _stop_children(self):
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap_children(respawn=False)
+            time.sleep(0.1)
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self._children:
+            pid, _ = os.waitpid(-1, 0)
+            self._children.pop(pid, None)
+
+    # -- worker -------------------------------------------------------------
+
+    def _run_worker(self, number):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        pool_size = self.worker_pool_size()
+        if pool_size is not None:
+            pool.configure_pool(max_size=pool_size)
+
+        sock = self.socket
+        if sock is None:
+            sock = create_listen_socket(self.host, self.port, reuse_port=True)
+        queue_size, queue_timeout = admission.thread_pool_admission(self.threads)
+        httpd = ThreadPoolHTTPServer(
+            (self.host, self.port),
+            self.handler_class,
+            threads=self.threads,
+            queue_size=queue_size,
+            sock=sock,
+            queue_timeout=queue_timeout,
+        )
+
+        def stop(signum, frame):
+            # shutdown() blocks until serve_forever returns, so it cannot run
+            # on the thread that is inside serve_forever
+            threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        print(f"Worker {number} started (pid {os.getpid()})")
+        try:
+            httpd.serve_forever()
+            httpd.drain(timeout=self.graceful_timeout)
+        finally:
+            httpd.server_close()
+            replicas.close_router()
+            pool.close_pool()
+        return 0
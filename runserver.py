@@ -1,11 +1,7 @@
-import psycopg
-
-from python_api_backend.settings import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from python_api_backend.db import create_indexes, get_db_connection
 
 # Connect to PostgreSQL
-conn = psycopg.connect(
-    host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD
-)
+conn = get_db_connection()
 
 # Open a cursor
 cur = conn.cursor()
@@ -36,6 +32,8 @@ CREATE TABLE IF NOT EXISTS users (
 """
 )
 
+create_indexes(cur)
+
 conn.commit()
 print("Tables created successfully.")
 